@@ -2,50 +2,101 @@ import sys
 import os
 import logging
 import time
-from typing import List, Dict, Any
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import multiprocessing
+from itertools import batched
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
 from data_utils.document_parser import DocumentChunker
 from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone.vectorstores import PineconeVectorStore
-from data_utils.vector_db import init_doctor_db, init_patient_db
-from langchain_core.documents import Document
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from data_utils.vector_db import init_doctor_db, init_doctor_grpc_index, init_patient_db
+from utils.file_cache import FileCache
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    logger.info("🔍 Initializing DocumentChunker...")
-    chunker = DocumentChunker()
-    logger.info("✅ DocumentChunker initialized successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to initialize DocumentChunker: {e}")
-    raise
-
-try:
-    logger.info("🔍 Initializing doctor database...")
-    index = init_doctor_db()
-    logger.info("✅ Doctor database initialized successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to initialize doctor database: {e}")
-    raise
-
-try:
-    logger.info("🔍 Initializing OpenAI embeddings...")
-    embeddings = OpenAIEmbeddings()
-    logger.info("✅ OpenAI embeddings initialized successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to initialize OpenAI embeddings: {e}")
-    raise
-
-try:
-    logger.info("🔍 Initializing PineconeVectorStore...")
-    vector_Db_doc=PineconeVectorStore(index , embeddings)
-    logger.info("✅ PineconeVectorStore initialized successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to initialize PineconeVectorStore: {e}")
-    raise
+# OpenAI accepts up to 2048 inputs per embeddings request; Pinecone
+# recommends upserts of ~100 vectors per request
+EMBEDDING_CHUNK_SIZE = 512
+UPSERT_BATCH_SIZE = 100
+UPSERT_POOL_THREADS = 4
+# Pinecone rejects vectors whose metadata exceeds 40KB, so cap the chunk
+# text stored alongside each vector
+MAX_METADATA_TEXT_LENGTH = 40000
+PINECONE_METADATA_LIMIT = 40 * 1024
+# Rating metadata larger than this gets its free-text fields cut down, so
+# there is always room left for the chunk text
+RATING_METADATA_BUDGET = 30000
+TRUNCATED_RATING_FIELD_LENGTH = 200
 
+# Chunk embeddings are cached on disk keyed by SHA-256 of the chunk text,
+# namespaced by embedding model, so re-ingests and shared boilerplate
+# chunks skip the OpenAI call
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "emb_cache")
+
+# Vector IDs are "<document id><separator><chunk number>", so one document's
+# vectors can be listed by ID prefix
+VECTOR_ID_SEPARATOR = "#"
+
+chunker = None
+index = None
+upsert_index = None
+embeddings = None
+_clients_pid = None
+
+
+def _init_clients():
+    """
+    Create the chunker, Pinecone index handle and embeddings client.
+    
+    Called at import; ``_init_worker`` calls it again in any worker process
+    that inherited clients from its parent, so no network client is ever
+    shared across processes.
+    """
+    global chunker, index, upsert_index, embeddings, _clients_pid
+    
+    try:
+        logger.info("🔍 Initializing DocumentChunker...")
+        chunker = DocumentChunker()
+        logger.info("✅ DocumentChunker initialized successfully")
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize DocumentChunker: {e}")
+        raise
+
+    try:
+        logger.info("🔍 Initializing doctor database...")
+        # pool_threads enables async_req upserts so batches are sent in parallel
+        index = init_doctor_db(pool_threads=UPSERT_POOL_THREADS)
+        # Prefer the gRPC client for upserts when it is installed
+        grpc_index = init_doctor_grpc_index()
+        upsert_index = grpc_index if grpc_index is not None else index
+        logger.info(f"✅ Doctor database initialized successfully (upserts via {'gRPC' if grpc_index is not None else 'REST'})")
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize doctor database: {e}")
+        raise
+
+    try:
+        logger.info("🔍 Initializing OpenAI embeddings...")
+        openai_embeddings = OpenAIEmbeddings(chunk_size=EMBEDDING_CHUNK_SIZE)
+        embeddings = CacheBackedEmbeddings.from_bytes_store(
+            openai_embeddings,
+            LocalFileStore(EMBEDDING_CACHE_DIR),
+            namespace=openai_embeddings.model,
+            key_encoder="sha256",
+        )
+        logger.info(f"✅ OpenAI embeddings initialized successfully (cache: {EMBEDDING_CACHE_DIR})")
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize OpenAI embeddings: {e}")
+        raise
+    
+    _clients_pid = os.getpid()
+
+
+_init_clients()
 
 
 def flatten_metadata(metadata):
@@ -79,7 +130,74 @@ def flatten_metadata(metadata):
                     flat_metadata[flat_key] = subvalue
     return flat_metadata
 
-def ingestion_docs_doctor(file: str, rating_metadata: dict = None):
+def _flatten_rating(rating_meta: dict) -> dict:
+    """
+    Specialized ``flatten_metadata`` for the rating metadata built in
+    ``ingestion_docs_doctor``: its values are already flat scalars, so only
+    None needs replacing (Pinecone rejects null metadata values).
+    """
+    return {k: ("" if v is None else v) for k, v in rating_meta.items()}
+
+def _metadata_size(metadata: dict) -> int:
+    """Approximate serialized size of a metadata dict in bytes."""
+    return sum(len(k) + len(str(v).encode('utf-8')) for k, v in metadata.items())
+
+def _fit_rating_metadata(rating_meta: dict) -> dict:
+    """
+    Keep the shared rating metadata within ``RATING_METADATA_BUDGET`` by
+    shortening its free-text fields and dropping the comments if needed.
+    """
+    if _metadata_size(rating_meta) <= RATING_METADATA_BUDGET:
+        return rating_meta
+    fitted = {
+        k: (v[:TRUNCATED_RATING_FIELD_LENGTH] if isinstance(v, str) else v)
+        for k, v in rating_meta.items()
+        if k != 'rating_comments'
+    }
+    logger.warning(f"Rating metadata exceeded {RATING_METADATA_BUDGET} bytes, truncated for Pinecone")
+    return fitted
+
+def _truncate_utf8(text: str, max_bytes: int) -> str:
+    """Truncate text to at most max_bytes of UTF-8 without splitting a character."""
+    encoded = text.encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode('utf-8', 'ignore')
+
+def _wait_for_upsert(future):
+    """Block on an async upsert from either the gRPC or the REST client."""
+    # gRPC returns concurrent futures, REST returns multiprocessing ApplyResults
+    if hasattr(future, 'result'):
+        return future.result()
+    return future.get()
+
+def _delete_stale_vectors(doc_id: str, chunk_count: int):
+    """
+    Delete vectors left over from an earlier ingest of the same document
+    that produced more chunks than this one.
+    """
+    prefix = f"{doc_id}{VECTOR_ID_SEPARATOR}"
+    try:
+        stale = [
+            vector_id
+            for ids in index.list(prefix=prefix)
+            for vector_id in ids
+            if int(vector_id[len(prefix):]) >= chunk_count
+        ]
+        for batch in batched(stale, UPSERT_BATCH_SIZE):
+            index.delete(ids=list(batch))
+        if stale:
+            logger.info(f"🗑️ Deleted {len(stale)} stale vectors of {doc_id}")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not delete stale vectors of {doc_id}: {e}")
+
+def chunk_document(file: str) -> List[Dict[str, Any]]:
+    """Split a document into chunks ready for ``ingestion_docs_doctor(chunks=...)``."""
+    return chunker.chunk_pdf(file)
+
+def ingestion_docs_doctor(file: str, rating_metadata: dict = None, bulk: bool = False,
+                          chunks: Optional[List[Dict[str, Any]]] = None,
+                          doc_id: Optional[str] = None):
     """
     Ingest a document into the vector database with optimized batch processing.
     
@@ -87,75 +205,101 @@ def ingestion_docs_doctor(file: str, rating_metadata: dict = None):
         file (str): Path to the document file
         rating_metadata (dict, optional): Rating metadata from the rater.
             Should contain 'scores' and 'metadata' keys.
+        bulk (bool): Favour throughput for large corpus loads: failed
+            batches are logged and skipped instead of retried per vector.
+        chunks (list, optional): Chunks already produced by ``chunk_document``;
+            the file is only parsed when they are not provided.
+        doc_id (str, optional): Content digest (``FileCache.file_digest``)
+            of the file, used to build its vector IDs; computed when not
+            provided.
     """
     try:
         start_time = time.time()
         logger.info(f"Processing file: {file}")
-        chunks = chunker.chunk_pdf(file)
+        if chunks is None:
+            chunks = chunk_document(file)
         
-        # Prepare rating metadata if provided
-        rating_meta = {}
+        # Prepare rating metadata if provided. The rater passes its metadata
+        # directly (not nested under 'metadata'), so read it as-is.
         if rating_metadata:
-            # Handle the structure passed by rater (direct metadata, not nested)
-            metadata_source = rating_metadata  # Rater passes metadata directly, not nested
-            
-            rating_meta.update({
-                'file_name': metadata_source.get('file_name'),
-                'total_score': metadata_source.get('total_score'),
-                'rating_keywords': ', '.join(metadata_source.get('Keywords', [])),
-                'rating_comments': ' | '.join(metadata_source.get('comments', [])),
-                'rating_penalties': ' | '.join(metadata_source.get('penalties', [])),
+            rating_meta = {
+                'file_name': rating_metadata.get('file_name'),
+                'total_score': rating_metadata.get('total_score'),
+                'rating_keywords': ', '.join(rating_metadata.get('Keywords', [])),
+                'rating_comments': ' | '.join(rating_metadata.get('comments', [])),
+                'rating_penalties': ' | '.join(rating_metadata.get('penalties', [])),
                 'is_rated': True,
                 'rating_source': 'CLARA-2',
-                'paper_type': metadata_source.get('paper_type', 'Unknown')  # Default to 'Unknown' if None
-            })
+                'paper_type': rating_metadata.get('paper_type', 'Unknown')  # Default to 'Unknown' if None
+            }
         else:
-            rating_meta['is_rated'] = False
+            rating_meta = {'is_rated': False}
         
-        # Prepare all documents for batch processing
-        documents = []
-        for chunk in chunks:
-            # Create document with only rating metadata
-            # Flatten metadata and ensure no None values for Pinecone compatibility
-            clean_metadata = flatten_metadata(rating_meta)
-            doc = Document(
-                page_content=chunk['text'],
-                metadata=clean_metadata
-            )
-            documents.append(doc)
+        # Rating metadata is identical for every chunk, so flatten it once;
+        # each vector only adds its own 'text' on top of this shared dict.
+        # Its size is budgeted once here, and the room it leaves under
+        # Pinecone's per-vector limit bounds every chunk's text.
+        clean_metadata = _flatten_rating(_fit_rating_metadata(rating_meta))
+        text_budget = min(MAX_METADATA_TEXT_LENGTH,
+                          PINECONE_METADATA_LIMIT - _metadata_size(clean_metadata) - len('text'))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Shared vector metadata: {clean_metadata}")
         
-        # Batch process documents - process in batches of 10 to avoid timeouts
-        batch_size = 10
-        total_batches = (len(documents) + batch_size - 1) // batch_size
+        # Embed every chunk with as few OpenAI requests as possible
+        texts = [chunk['text'] for chunk in chunks]
+        if not texts:
+            logger.warning(f"No chunks extracted from {file}, nothing to ingest")
+            return True
+        vectors = embeddings.embed_documents(texts)
         
-        logger.info(f"Processing {len(documents)} chunks in {total_batches} batches of size {batch_size}")
+        # IDs derive from the file content, not its name: re-ingesting the
+        # same paper overwrites its previous vectors, while different papers
+        # uploaded under the same name never collide. The chunk text is
+        # stored under 'text', the key PineconeVectorStore reads at query time.
+        if not doc_id:
+            doc_id = FileCache.file_digest(file)
+        if not doc_id:
+            raise ValueError(f"Could not hash {file} to build its vector IDs")
+        items = [
+            (f"{doc_id}{VECTOR_ID_SEPARATOR}{i}", vector, {**clean_metadata, 'text': _truncate_utf8(text, text_budget)})
+            for i, (vector, text) in enumerate(zip(vectors, texts))
+        ]
+        batches = [list(batch) for batch in batched(items, UPSERT_BATCH_SIZE)]
         
-        for i in range(0, len(documents), batch_size):
-            batch = documents[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            
+        logger.info(f"Upserting {len(items)} chunks in {len(batches)} parallel batches of size {UPSERT_BATCH_SIZE}")
+        
+        # Submit every batch before waiting on any of them so network
+        # latency of all batches overlaps
+        futures = [upsert_index.upsert(vectors=batch, async_req=True) for batch in batches]
+        
+        had_errors = False
+        for batch_num, (batch, future) in enumerate(zip(batches, futures), 1):
             try:
-                logger.debug(f"Processing batch {batch_num}/{total_batches} with {len(batch)} documents")
-                vector_Db_doc.add_documents(batch)
+                _wait_for_upsert(future)
                 logger.debug(f"✅ Batch {batch_num} completed successfully")
                 
             except Exception as pinecone_error:
                 logger.error(f"❌ Pinecone error in batch {batch_num}: {pinecone_error}")
-                # Try individual documents if batch fails
-                logger.info("Attempting to process batch documents individually...")
+                had_errors = True
+                if bulk:
+                    # Bulk loads favour throughput; re-run the file to fill gaps
+                    continue
                 
-                for j, doc in enumerate(batch):
+                # Try individual vectors if the batch fails
+                logger.info("Attempting to process batch vectors individually...")
+                for j, item in enumerate(batch):
                     try:
-                        vector_Db_doc.add_documents([doc])
-                        logger.debug(f"✅ Individual document {j+1} in batch {batch_num} processed")
+                        upsert_index.upsert(vectors=[item])
+                        logger.debug(f"✅ Individual vector {j+1} in batch {batch_num} processed")
                     except Exception as individual_error:
-                        logger.error(f"❌ Failed to process individual document {j+1}: {individual_error}")
+                        logger.error(f"❌ Failed to process individual vector {j+1}: {individual_error}")
                         continue
-                
-                # If we're here, at least some documents failed, but we continue
-                if batch_num == total_batches:  # Last batch
-                    logger.warning("RAG processing completed with some errors")
-                    return True
+        
+        _delete_stale_vectors(doc_id, len(items))
+        
+        if had_errors:
+            logger.warning("RAG processing completed with some errors")
+            return True
         
         processing_time = time.time() - start_time
         logger.info(f"✅ RAG processing completed successfully in {processing_time:.2f}s")
@@ -165,4 +309,43 @@ def ingestion_docs_doctor(file: str, rating_metadata: dict = None):
         logger.error(f"❌ Critical error in RAG processing: {str(e)}")
         import traceback
         logger.error(f"📚 RAG Error traceback: {traceback.format_exc()}")
-        return None
\ No newline at end of file
+        return None
+
+
+def _init_worker():
+    """Pool initializer: give each worker process its own clients."""
+    if _clients_pid != os.getpid():
+        _init_clients()
+
+
+def _ingest_one_worker(args):
+    file, rating_metadata, bulk = args
+    return ingestion_docs_doctor(file, rating_metadata, bulk=bulk)
+
+
+def ingest_many(pairs: Iterable[Tuple[str, Optional[dict]]], workers: int = 4, bulk: bool = False) -> list:
+    """
+    Ingest several documents concurrently in separate processes.
+    
+    PDF chunking is CPU-bound, so each document is parsed and embedded in
+    its own worker process. Workers are spawned rather than forked so they
+    never inherit the parent's Pinecone/OpenAI connections.
+    
+    Args:
+        pairs: Iterable of ``(file_path, rating_metadata)`` tuples
+        workers: Number of worker processes
+        bulk: Skip per-vector retries of failed batches (see ``ingestion_docs_doctor``)
+        
+    Returns:
+        list: The ``ingestion_docs_doctor`` result for each pair, in order
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    
+    workers = max(1, min(workers, len(pairs)))
+    logger.info(f"Ingesting {len(pairs)} documents with {workers} worker processes")
+    
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker) as pool:
+        return pool.map(_ingest_one_worker, [(file, meta, bulk) for file, meta in pairs])
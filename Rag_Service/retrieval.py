@@ -1,18 +1,36 @@
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import copy
+import time
+import threading
+from functools import lru_cache
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
 
+import numpy as np
 from langchain_pinecone import PineconeRerank
 from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
-from dotenv import load_dotenv
+from utils.env import load_env
 from langchain_pinecone import pinecone, PineconeVectorStore 
 from data_utils.vector_db import init_doctor_db, init_patient_db, DOCTOR_INDEX
 import os
 import logging
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Query cache settings: exact repeats are served by an LRU cache, near
+# duplicates by cosine similarity against recently answered queries
+QUERY_CACHE_SIZE = 1024
+SEMANTIC_CACHE_SIZE = 256
+SEMANTIC_CACHE_THRESHOLD = 0.95
+# Cached answers are dropped after this many seconds, so documents ingested
+# since a query was first answered show up for it
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "300"))
 
 
 # Initialize the doctor index
@@ -25,15 +43,77 @@ vector_doc_db = PineconeVectorStore.from_existing_index(
     embedding=embeddings
 )
 
-def query_doc(query: str):
-    # Get similar documents
-    docs = vector_doc_db.similarity_search(query, k=6)
+# Reuse a single reranker client across queries
+reranker = PineconeRerank()
+
+
+class _SemanticQueryCache:
+    """Fixed-size ring buffer of normalized query embeddings and their results."""
+    
+    def __init__(self, size: int, threshold: float, ttl: float):
+        self.size = size
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors = None
+        self._results = [None] * size
+        self._stored_at = np.zeros(size)
+        self._count = 0
+        self._next = 0
+        self._lock = threading.Lock()
     
-    reranker = PineconeRerank()
+    def get(self, vector: np.ndarray):
+        """Return the cached result of the most similar query above the threshold."""
+        with self._lock:
+            if not self._count:
+                return None
+            similarities = self._vectors[:self._count] @ vector
+            # Expired entries can never match
+            similarities[self._stored_at[:self._count] < time.monotonic() - self.ttl] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return self._results[best]
+            return None
+    
+    def put(self, vector: np.ndarray, result) -> None:
+        """Store a query result, overwriting the oldest entry when full."""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.size, vector.shape[0]), dtype=np.float32)
+            self._vectors[self._next] = vector
+            self._results[self._next] = result
+            self._stored_at[self._next] = time.monotonic()
+            self._next = (self._next + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+
+
+_semantic_cache = _SemanticQueryCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, QUERY_CACHE_TTL)
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _cached_query(query: str, ttl_bucket: int):
+    # ttl_bucket changes every QUERY_CACHE_TTL seconds, so each exact-match
+    # entry is reused within its time window only.
+    # Embed once and reuse the vector for both the semantic lookup and search
+    query_vector = embeddings.embed_query(query)
+    normalized = np.asarray(query_vector, dtype=np.float32)
+    normalized /= max(float(np.linalg.norm(normalized)), 1e-12)
+    
+    cached = _semantic_cache.get(normalized)
+    if cached is not None:
+        logger.debug(f"Semantic cache hit for query: {query!r}")
+        return cached
+    
+    # Get similar documents
+    docs = vector_doc_db.similarity_search_by_vector(query_vector, k=6)
     
     reranked_docs = reranker.rerank(
         query=query,
         documents=[doc.page_content for doc in docs]
     )
+    _semantic_cache.put(normalized, reranked_docs)
     return reranked_docs
 
+
+def query_doc(query: str):
+    # Deep copy so callers can't mutate the cached documents
+    return copy.deepcopy(_cached_query(query, int(time.time() // QUERY_CACHE_TTL)))
@@ -1,8 +1,8 @@
 import os
-from dotenv import load_dotenv
+from utils.env import load_env
 
 # Load environment variables from .env file
-load_dotenv()
+load_env()
 
 # S3 Configuration
 S3_CONFIG = {
@@ -17,7 +17,14 @@ S3_CONFIG = {
 # Processing Configuration
 PROCESSING_CONFIG = {
     'max_daily_downloads': 1000,  # Maximum files to process per day
-    'supported_file_types': ['.pdf', '.docx', '.txt', '.md']  # Supported file types
+    'supported_file_types': ['.pdf', '.docx', '.txt', '.md'],  # Supported file types
+    # S3 transfer tuning: objects above the threshold are fetched as ranged
+    # parts of multipart_chunksize, read in io_chunksize buffers
+    'multipart_threshold': 8 * 1024 * 1024,
+    'multipart_chunksize': 64 * 1024 * 1024,
+    'io_chunksize': 256 * 1024,
+    'max_io_queue': 1000,
+    'max_workers': int(os.getenv('S3_MAX_WORKERS', '16'))  # Concurrent S3 downloads
 }
 
 # Database Configuration
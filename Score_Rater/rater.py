@@ -1,12 +1,22 @@
 import os
+import re
+import stat
 import sys
+import atexit
+import hashlib
+import textwrap
 import logging
 import json
 import time
+import base64
+import random
 import asyncio
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from openai import OpenAI
-from dotenv import load_dotenv
+import httpx
+from openai import OpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
 from typing import Optional
 
 # Configure logging first
@@ -14,20 +24,35 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 # Add project root to Python path
-sys.path.append(str(Path(__file__).parent.parent))
+_PROJECT_ROOT = str(Path(__file__).parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+
+# Load environment variables once at import
+from utils.env import load_env
+load_env()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Import cache utility
 try:
-    from utils.file_cache import get_cache
+    from utils.file_cache import get_cache, FileCache
     CACHE_AVAILABLE = True
     logger.info("✅ File cache imported successfully")
 except ImportError as e:
     logger.warning(f"❌ File cache import failed: {e}")
     CACHE_AVAILABLE = False
 
+# Import semantic (paper-text embedding) cache
+try:
+    from Score_Rater.semantic_cache import get_semantic_cache, extract_paper_text
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"❌ Semantic cache import failed: {e}")
+    SEMANTIC_CACHE_AVAILABLE = False
+
 # Import RAG ingestion function
 try:
-    from Rag_Service.ingestion import ingestion_docs_doctor
+    from Rag_Service.ingestion import ingestion_docs_doctor, chunk_document
     RAG_AVAILABLE = True
     logger.info("✅ RAG Service imported successfully - RAG processing enabled")
 except ImportError as e:
@@ -40,8 +65,8 @@ except Exception as e:
 
 # Import database models
 try:
-    from database.models import ResearchPaper, ResearchPaperScore, ResearchPaperKeyword, ResearchPaperComment
     from database.database import SessionLocal
+    from database.crud import save_paper
     DB_AVAILABLE = True
 except ImportError as e:
     logger.warning(f"Database module not available: {e}. Running in local mode only.")
@@ -51,33 +76,137 @@ except ImportError as e:
 # STEP 1: CREATE THE CLARA AI SYSTEM PROMPT
 # ---------------------------------------------------------------------
 
+# orjson parses and serializes JSON several times faster than the stdlib;
+# fall back to json when it isn't installed. orjson.JSONDecodeError is a
+# subclass of json.JSONDecodeError, so callers only need to catch the latter.
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+# HTTP/2 lets the upload/evaluate/delete calls for a paper share a single
+# multiplexed TLS connection; it needs the optional h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 # Initialize OpenAI client with optimized settings
 def get_openai_client():
     """Get optimized OpenAI client with connection pooling."""
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
+    api_key = OPENAI_API_KEY
     if not api_key:
         logger.error("OPENAI_API_KEY not found in environment variables")
         raise ValueError("OPENAI_API_KEY environment variable is required")
     
+    # Keep-alive pool reused across every request made by this process and
+    # sized for the concurrent papers of process_papers/the upload route;
+    # closed at interpreter exit
+    http_client = httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+    atexit.register(http_client.close)
+    
     return OpenAI(
         api_key=api_key,
         max_retries=3,  # Enable automatic retries
         timeout=60.0,   # 60 second timeout
+        http_client=http_client,
     )
 
 # Global client instance for connection reuse
 _client = None
+_client_lock = threading.Lock()
 
 def get_client():
     """Get or create global OpenAI client instance."""
     global _client
     if _client is None:
-        _client = get_openai_client()
+        with _client_lock:
+            if _client is None:
+                _client = get_openai_client()
     return _client
 
 client = get_client()
-clara_prompt = """
+
+# Cap on papers processed at once in this process; main's request limiter
+# uses the same value
+MAX_CONCURRENT_PAPERS = int(os.getenv("MAX_CONCURRENT_PAPERS", "32"))
+
+# Pools for work that overlaps with the OpenAI round trips. CPU-bound PDF
+# chunking gets its own pool sized to the cores, so multi-second chunk jobs
+# never queue ahead of the DB saves and OpenAI file deletes that requests
+# wait on; the I/O pool has a thread per concurrently processed paper
+_chunk_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="rater-chunk")
+_background_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PAPERS, thread_name_prefix="rater-bg")
+
+# Cap on in-flight OpenAI requests across all threads of this process, so a
+# large batch doesn't trip the account's rate limit tier
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "20"))
+_openai_semaphore = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+
+# Upper bound for a single backoff sleep between retries
+MAX_RETRY_DELAY = 32.0
+
+# Transient failures worth another attempt: rate limits, dropped connections
+# and timeouts, and 5xx responses. Anything else (bad request, auth, not
+# found, schema rejections) fails the same way on every attempt
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def _is_retryable(error) -> bool:
+    """Whether a failed OpenAI call should be attempted again."""
+    return isinstance(error, RETRYABLE_ERRORS)
+
+def _retry_delay(error, default_delay):
+    """Seconds to wait before retrying, honoring Retry-After on 429 responses."""
+    if isinstance(error, RateLimitError):
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            return min(float(retry_after), MAX_RETRY_DELAY)
+        except (TypeError, ValueError):
+            pass
+    # Jitter keeps concurrent papers from retrying in lockstep
+    return min(default_delay, MAX_RETRY_DELAY) * random.uniform(0.5, 1.0)
+
+def _call_with_retries(operation, action, max_retries, retry_delay):
+    """
+    Call operation() with exponential backoff between failed attempts.
+    
+    Args:
+        operation: Zero-argument callable performing one attempt
+        action: Name of the operation used in log messages, e.g. "Upload"
+        max_retries: Total number of attempts
+        retry_delay: Delay before the first retry, doubled after each one
+        
+    Returns:
+        The return value of the first successful attempt; the exception of
+        the last attempt is re-raised if all of them fail, and a
+        non-retryable exception is re-raised immediately
+    """
+    for attempt in range(max_retries):
+        try:
+            return operation()
+        except Exception as e:
+            if not _is_retryable(e):
+                logger.error(f"❌ {action} failed: {e}")
+                raise
+            if attempt == max_retries - 1:
+                logger.error(f"❌ {action} failed after {max_retries} attempts: {e}")
+                raise
+            wait = _retry_delay(e, retry_delay)
+            logger.warning(f"⚠️ {action} attempt {attempt + 1} failed: {e}. Retrying in {wait:.1f}s...")
+            time.sleep(wait)
+            retry_delay *= 2  # Exponential backoff
+
+clara_prompt = textwrap.dedent("""
 You are CLARA-2, an expert Context-Aware Clinical Evidence Appraiser.
 You evaluate biomedical studies using the structured scoring framework described in the attached specification document (clara2.docx).
 Your outputs must be reproducible, transparent, and standards-aligned with CONSORT, PRISMA, and STROBE reporting guidelines.
@@ -218,82 +347,250 @@ Never fabricate missing details (mark as Unknown/Abstain).
 All rationales must cite exact text evidence if possible.
 
 Maintain confidence calibration per framework.
-"""
+""").strip()
+
+# The static system prompt is sent as the first input block of every
+# request and must be byte-identical across calls and processes so that
+# OpenAI's automatic prompt caching can reuse its prefill. It is normalized
+# once at import above; the hash identifies the prompt version in logs.
+CLARA_SYSTEM = clara_prompt
+CLARA_PROMPT_HASH = hashlib.blake2b(CLARA_SYSTEM.encode(), digest_size=8).hexdigest()
 
 # ---------------------------------------------------------------------
 # STEP 2: UPLOAD THE FILE TO OPENAI
 # ---------------------------------------------------------------------
 
-def upload_file_to_openai(file_path):
+def upload_file_to_openai(file_path, file_name=None):
     """Upload file to OpenAI with retry logic and optimized settings."""
-    client = get_client()
+    # _call_with_retries does the retrying, so the SDK's own retries are
+    # disabled for this call and the attempts of the two layers don't multiply
+    client = get_client().with_options(max_retries=0)
     
-    original_filename = os.path.basename(file_path)
+    original_filename = file_name or os.path.basename(file_path)
     logger.info(f"📄 Uploading file: {file_path}")
     
-    max_retries = 3
-    retry_delay = 1.0  # Start with 1 second delay
+    def _upload():
+        with _openai_semaphore, open(file_path, "rb") as file_obj:
+            return client.files.create(file=file_obj, purpose="assistants")
     
-    for attempt in range(max_retries):
-        try:
-            with open(file_path, "rb") as file_obj:
-                uploaded_file = client.files.create(file=file_obj, purpose="assistants")
-            logger.info(f"✅ Uploaded successfully | File ID: {uploaded_file.id} | Filename: {original_filename}")
-            return uploaded_file
-        except Exception as e:
-            if attempt < max_retries - 1:
-                logger.warning(f"⚠️ Upload attempt {attempt + 1} failed: {e}. Retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                logger.error(f"❌ File upload failed after {max_retries} attempts: {e}")
-                raise
+    uploaded_file = _call_with_retries(_upload, "File upload", max_retries=5, retry_delay=1.0)
+    logger.info(f"✅ Uploaded successfully | File ID: {uploaded_file.id} | Filename: {original_filename}")
+    return uploaded_file
 
 # ---------------------------------------------------------------------
 # STEP 3: RUN THE CLARA-2 EVALUATION
 # ---------------------------------------------------------------------
 
+CLARA_MODEL = "gpt-4.1-mini"  # or "gpt-4o" for higher accuracy
+
+# Structured output schema mirroring the JSON format requested in the
+# prompt; strict mode guarantees the response parses and has every key
+CLARA_SCORE_CATEGORIES = (
+    "study_design", "sample_size_power", "stats_quality", "registration",
+    "effect_precision", "reporting", "reproducibility", "external_validity",
+    "clinical_relevance", "novelty", "ethics_coi",
+)
+
+CLARA_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scores": {
+            "type": "object",
+            "properties": {
+                category: {
+                    "type": "object",
+                    "properties": {
+                        "score": {"type": "integer"},
+                        "rationale": {"type": "string"}
+                    },
+                    "required": ["score", "rationale"],
+                    "additionalProperties": False
+                }
+                for category in CLARA_SCORE_CATEGORIES
+            },
+            "required": list(CLARA_SCORE_CATEGORIES),
+            "additionalProperties": False
+        },
+        "penalties": {"type": "array", "items": {"type": "string"}},
+        "total_score": {"type": "integer"},
+        "confidence": {"type": "number"},
+        "comments": {"type": "array", "items": {"type": "string"}},
+        "Keywords": {"type": "array", "items": {"type": "string"}},
+        "paper_type": {"type": "string"}
+    },
+    "required": ["scores", "penalties", "total_score", "confidence", "comments", "Keywords", "paper_type"],
+    "additionalProperties": False
+}
+
+# PDFs below this size are sent inline as base64 in the evaluation request,
+# skipping the separate upload and delete round trips
+INLINE_FILE_MAX_BYTES = 20_000_000
+
+def build_clara_request(file_id=None, file_data=None, filename=None):
+    """
+    Build the Responses API request body for evaluating a paper, referenced
+    either by an uploaded file_id or inline as base64 file_data.
+    """
+    if file_id is not None:
+        file_input = {"type": "input_file", "file_id": file_id}
+    else:
+        file_input = {"type": "input_file", "filename": filename,
+                      "file_data": f"data:application/pdf;base64,{file_data}"}
+    return {
+        "model": CLARA_MODEL,
+        # Deterministic sampling: same paper -> same score, and the
+        # identical request prefix stays eligible for prompt caching
+        "temperature": 0,
+        "text": {
+            "format": {"type": "json_schema", "name": "clara2", "schema": CLARA_SCHEMA, "strict": True}
+        },
+        "input": [
+            {
+                "role": "system",
+                "content": [{"type": "input_text", "text": CLARA_SYSTEM}]
+            },
+            {
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": "Evaluate the quality of the uploaded research paper and return the JSON output."},
+                    file_input
+                ]
+            }
+        ]
+    }
+
 def run_clara_evaluation(uploaded_file):
-    """Run CLARA evaluation with retry logic and optimized settings."""
-    client = get_client()
+    """Run CLARA evaluation on an uploaded file."""
+    return _run_clara_request(build_clara_request(file_id=uploaded_file.id))
+
+def run_clara_evaluation_inline(file_path, file_name=None):
+    """Run CLARA evaluation with the PDF sent inline instead of uploaded."""
+    with open(file_path, "rb") as f:
+        file_data = base64.b64encode(f.read()).decode("ascii")
+    return _run_clara_request(build_clara_request(file_data=file_data,
+                                                  filename=file_name or os.path.basename(file_path)))
+
+def _run_clara_request(request):
+    """Run a CLARA evaluation request with retry logic and optimized settings."""
+    # Retried by _call_with_retries only (see upload_file_to_openai)
+    client = get_client().with_options(max_retries=0)
     
     logger.info("🧠 Running CLARA AI evaluation via Responses API...")
     
-    max_retries = 3
-    retry_delay = 1.0
+    def _evaluate():
+        with _openai_semaphore:
+            return client.responses.create(**request)
     
-    for attempt in range(max_retries):
-        try:
-            response = client.responses.create(
-                model="gpt-4.1-mini",  # or "gpt-4o" for higher accuracy
-                input=[
-                {
-                    "role": "system",
-                    "content": clara_prompt
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "input_text", "text": "Evaluate the quality of the uploaded research paper and return the JSON output."},
-                        {"type": "input_file", "file_id": uploaded_file.id}
-                    ]
-                }
-            ]
-        )
-                
-            result_text = response.output[0].content[0].text
-            logger.info("\n✅ Evaluation Completed Successfully.")
-            logger.info("🧾 Output JSON:\n%s", result_text)
-            return result_text
-            
-        except Exception as e:
-            if attempt < max_retries - 1:
-                logger.warning(f"⚠️ Evaluation attempt {attempt + 1} failed: {e}. Retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                logger.error(f"❌ Error during evaluation after {max_retries} attempts: {e}")
-                return None
+    try:
+        response = _call_with_retries(_evaluate, "Evaluation", max_retries=5, retry_delay=1.0)
+    except Exception:
+        return None
+    
+    result_text = response.output[0].content[0].text
+    logger.info("\n✅ Evaluation Completed Successfully.")
+    if response.usage:
+        cached_tokens = response.usage.input_tokens_details.cached_tokens
+        logger.info(f"📊 Prompt {CLARA_PROMPT_HASH} tokens: {response.usage.input_tokens} (cached: {cached_tokens})")
+    logger.info("🧾 Output JSON:\n%s", result_text)
+    return result_text
+
+# ---------------------------------------------------------------------
+# STEP 3b: BULK EVALUATION VIA THE BATCH API
+# ---------------------------------------------------------------------
+
+# Polling interval while waiting for a batch, and the statuses after which
+# a batch will not make any further progress
+BATCH_POLL_INTERVAL = 60.0
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+def submit_batch(file_ids):
+    """
+    Submit CLARA evaluations of already-uploaded files as one Batch API job.
+    
+    Batch requests are billed at half the synchronous price and complete
+    within 24h, which suits queued bulk scoring runs.
+    
+    Args:
+        file_ids: OpenAI file IDs of the uploaded papers
+        
+    Returns:
+        str: The batch ID; each request's custom_id is its file ID
+    """
+    client = get_client()
+    
+    request_lines = b"\n".join(
+        _json_dumps({
+            "custom_id": file_id,
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": build_clara_request(file_id=file_id)
+        })
+        for file_id in file_ids
+    )
+    batch_input = client.files.create(file=("clara_batch.jsonl", request_lines), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_input.id,
+        endpoint="/v1/responses",
+        completion_window="24h"
+    )
+    logger.info(f"📦 Submitted batch {batch.id} with {len(file_ids)} evaluations")
+    return batch.id
+
+def collect_batch(batch_id, poll_interval=BATCH_POLL_INTERVAL):
+    """
+    Wait for a batch to finish and yield its evaluation outputs.
+    
+    Args:
+        batch_id: ID returned by ``submit_batch``
+        poll_interval: Seconds between status checks
+        
+    Yields:
+        tuple: ``(file_id, result_text)``; result_text is None for requests
+        that failed inside the batch
+    """
+    client = get_client()
+    
+    batch = client.batches.retrieve(batch_id)
+    try:
+        while batch.status not in BATCH_TERMINAL_STATUSES:
+            logger.info(f"⏳ Batch {batch_id} is {batch.status}, checking again in {poll_interval}s...")
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch_id)
+        
+        if batch.status != "completed":
+            logger.error(f"❌ Batch {batch_id} finished with status {batch.status}")
+        
+        # Successful requests land in the output file and failed ones in the
+        # error file; an expired or cancelled batch can still have both
+        failed = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = client.files.content(file_id).read()
+            for line in content.splitlines():
+                if not line:
+                    continue
+                row = _json_loads(line)
+                response = row.get("response") or {}
+                if row.get("error") or response.get("status_code") != 200:
+                    logger.error(f"❌ Batch request {row['custom_id']} failed: {row.get('error') or response.get('status_code')}")
+                    failed.append(row["custom_id"])
+                    yield row["custom_id"], None
+                    continue
+                yield row["custom_id"], response["body"]["output"][0]["content"][0]["text"]
+        
+        if failed:
+            logger.warning(f"⚠️ {len(failed)} requests of batch {batch_id} failed: {', '.join(failed)}")
+    finally:
+        # Also runs when the caller stops iterating early or fails; a batch
+        # that is still running keeps its input file
+        if batch.status in BATCH_TERMINAL_STATUSES:
+            for file_id in (batch.input_file_id, batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    try:
+                        client.files.delete(file_id)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Failed to delete batch file {file_id}: {e}")
 
 # ---------------------------------------------------------------------
 # STEP 4: DELETE THE FILE FROM OPENAI AFTER PROCESSING
@@ -301,26 +598,16 @@ def run_clara_evaluation(uploaded_file):
 
 def delete_file_from_openai(uploaded_file):
     """Delete file from OpenAI with retry logic."""
-    client = get_client()
+    # Retried by _call_with_retries only (see upload_file_to_openai)
+    client = get_client().with_options(max_retries=0)
     
     logger.info("\n🧹 Cleaning up temporary uploaded file from OpenAI...")
     
-    max_retries = 2
-    retry_delay = 0.5
-    
-    for attempt in range(max_retries):
-        try:
-            client.files.delete(uploaded_file.id)
-            logger.info(f"🗑️ File {uploaded_file.id} deleted successfully from OpenAI.")
-            return
-        except Exception as e:
-            if attempt < max_retries - 1:
-                logger.warning(f"⚠️ Delete attempt {attempt + 1} failed: {e}. Retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-                retry_delay *= 2
-            else:
-                logger.error(f"⚠️ Failed to delete file from OpenAI after {max_retries} attempts: {e}")
-                # Don't raise - cleanup failure shouldn't break the main flow
+    try:
+        _call_with_retries(lambda: client.files.delete(uploaded_file.id), "Delete", max_retries=2, retry_delay=0.5)
+        logger.info(f"🗑️ File {uploaded_file.id} deleted successfully from OpenAI.")
+    except Exception:
+        pass  # Don't raise - cleanup failure shouldn't break the main flow
 
 def process_rater_output(result_text):
     """
@@ -328,43 +615,38 @@ def process_rater_output(result_text):
     Returns a dictionary with 'scores' and 'metadata' keys.
     """
     try:
-        # Parse the JSON response
-        result = json.loads(result_text)
-        logger.info(f"DEBUG: Parsed JSON keys: {list(result.keys())}")
-        logger.info(f"DEBUG: Total score in JSON: {result.get('total_score')}")
-        logger.info(f"DEBUG: Paper type in JSON: {result.get('paper_type')}")
+        # Parse the JSON response; structured outputs guarantee it is valid
+        # JSON matching CLARA_SCHEMA, so a single fast parse suffices
+        result = _json_loads(result_text)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Parsed JSON keys: %s", result.keys())
+            logger.debug("Total score in JSON: %s", result.get('total_score'))
+            logger.debug("Paper type in JSON: %s", result.get('paper_type'))
         
-        # Initialize the output structure
+        # Initialize the output structure; score rows are built in a single
+        # comprehension and stay plain dicts so the output remains directly
+        # JSON-serializable for the file cache and the API response
         processed = {
-            'scores': [],
-            'metadata': {}
-        }
-        
-        # Process scores
-        if 'scores' in result:
-            for category, details in result['scores'].items():
-                processed['scores'].append({
+            'scores': [
+                {
                     'category': category.replace('_', ' ').title(),
                     'score': details.get('score', 0),
                     'rationale': details.get('rationale', 'No rationale provided')
-                })
-        
-        # Add metadata with default values
-        metadata_fields = {
-            'total_score': 0,
-            'confidence': 0,
-            'comments': [],
-            'Keywords': [],
-            'paper_type': 'Unknown'  # Default value for Paper_Type
+                }
+                for category, details in result.get('scores', {}).items()
+            ],
+            'metadata': {}
         }
         
-        # Update with actual values from result
-        for field, default in metadata_fields.items():
-            actual_value = result.get(field, default)
-            logger.info(f"DEBUG: Field '{field}' -> {actual_value}")
-            processed['metadata'][field] = actual_value
+        # Add metadata with default values
+        metadata = processed['metadata']
+        metadata['total_score'] = result.get('total_score', 0)
+        metadata['confidence'] = result.get('confidence', 0)
+        metadata['comments'] = result.get('comments', [])
+        metadata['Keywords'] = result.get('Keywords', [])
+        metadata['paper_type'] = result.get('paper_type', 'Unknown')  # Default value for Paper_Type
         
-        logger.info(f"DEBUG: Final metadata: {processed['metadata']}")
+        logger.debug("Final metadata: %s", processed['metadata'])
         
         # Add penalties if any
         if 'penalties' in result and result['penalties']:
@@ -379,13 +661,17 @@ def process_rater_output(result_text):
         logger.error(f"Error processing rater output: {str(e)}")
         return None
 
-def save_to_database(processed_output, file_path):
+# Comments mentioning any of these words are stored as penalties
+PENALTY_RE = re.compile(r'penalty|penalized|violation', re.IGNORECASE)
+
+def save_to_database(processed_output, file_path, file_name=None):
     """
     Save the processed output to the database using optimized bulk operations.
     
     Args:
         processed_output (dict): The processed output from process_rater_output()
         file_path (str): Path to the processed file
+        file_name (str, optional): Base name of file_path, if already known
     
     Returns:
         int: The ID of the created ResearchPaper record, or None if failed
@@ -396,75 +682,50 @@ def save_to_database(processed_output, file_path):
     
     db = SessionLocal()
     try:
-        # Create ResearchPaper record
+        # ResearchPaper record
         metadata = processed_output['metadata']
-        research_paper = ResearchPaper(
-            file_name=os.path.basename(file_path),
-            total_score=metadata.get('total_score', 0),
-            confidence=int(metadata.get('confidence', 0) * 100),
-            paper_type=metadata.get('paper_type', '')
-        )
-        db.add(research_paper)
-        db.flush()  # Flush to get the ID for relationships
-        
-        # Prepare bulk insert operations
-        scores_to_insert = []
-        keywords_to_insert = []
-        comments_to_insert = []
-        
-        # Collect scores for bulk insert
-        for score_data in processed_output['scores']:
-            scores_to_insert.append(ResearchPaperScore(
-                research_paper_id=research_paper.id,
-                category=score_data['category'],
-                score=score_data['score'],
-                rationale=score_data['rationale'],
-                max_score=10  # Default max score, adjust if needed
-            ))
+        paper = {
+            'file_name': file_name or os.path.basename(file_path),
+            'total_score': metadata.get('total_score', 0),
+            'confidence': int(metadata.get('confidence', 0) * 100),
+            'paper_type': metadata.get('paper_type', '')
+        }
         
-        # Collect keywords for bulk insert
-        for keyword in metadata.get('Keywords', []):
-            keywords_to_insert.append(ResearchPaperKeyword(
-                research_paper_id=research_paper.id,
-                keyword=keyword[:255]  # Ensure it fits in the String field
-            ))
+        # Plain row dicts for the child tables; save_paper fills in the
+        # paper ID and inserts them with one executemany per table
+        score_rows = [
+            {
+                'category': score_data['category'],
+                'score': score_data['score'],
+                'rationale': score_data['rationale'],
+                'max_score': 10  # Default max score, adjust if needed
+            }
+            for score_data in processed_output['scores']
+        ]
         
-        # Collect comments for bulk insert
-        for comment in metadata.get('comments', []):
-            is_penalty = any(penalty_word in comment.lower() 
-                           for penalty_word in ['penalty', 'penalized', 'violation'])
-            
-            comments_to_insert.append(ResearchPaperComment(
-                research_paper_id=research_paper.id,
-                comment=comment,
-                is_penalty=is_penalty
-            ))
+        keyword_rows = [
+            {'keyword': keyword[:255]}  # Ensure it fits in the String field
+            for keyword in metadata.get('Keywords', [])
+        ]
         
+        comment_rows = [
+            {
+                'comment': comment,
+                'is_penalty': PENALTY_RE.search(comment) is not None
+            }
+            for comment in metadata.get('comments', [])
+        ]
         # Add penalties from the penalties list
-        for penalty in metadata.get('penalties', []):
-            comments_to_insert.append(ResearchPaperComment(
-                research_paper_id=research_paper.id,
-                comment=penalty,
-                is_penalty=True
-            ))
-        
-        # Perform bulk inserts
-        if scores_to_insert:
-            db.bulk_save_objects(scores_to_insert, return_defaults=True)
-            logger.info(f"✅ Bulk inserted {len(scores_to_insert)} scores")
-        
-        if keywords_to_insert:
-            db.bulk_save_objects(keywords_to_insert, return_defaults=True)
-            logger.info(f"✅ Bulk inserted {len(keywords_to_insert)} keywords")
-        
-        if comments_to_insert:
-            db.bulk_save_objects(comments_to_insert, return_defaults=True)
-            logger.info(f"✅ Bulk inserted {len(comments_to_insert)} comments")
+        comment_rows.extend(
+            {'comment': penalty, 'is_penalty': True}
+            for penalty in metadata.get('penalties', [])
+        )
         
-        # Single commit for all operations
-        db.commit()
-        logger.info(f"✅ Successfully saved to database with ID: {research_paper.id}")
-        return research_paper.id
+        paper_id = save_paper(db, paper, score_rows, keyword_rows, comment_rows)
+        logger.info(f"✅ Bulk inserted {len(score_rows)} scores, "
+                    f"{len(keyword_rows)} keywords, {len(comment_rows)} comments")
+        logger.info(f"✅ Successfully saved to database with ID: {paper_id}")
+        return paper_id
         
     except Exception as e:
         db.rollback()
@@ -475,7 +736,20 @@ def save_to_database(processed_output, file_path):
     finally:
         db.close()
 
-def process_paper(file_path: str, skip_rag: bool = False, skip_db: bool = False) -> dict:
+def _build_rag_metadata(processed_output, file_name):
+    """Build the rating metadata passed to RAG ingestion, without None values."""
+    metadata = processed_output.get('metadata', {})
+    rag_metadata = {
+        'paper_id': processed_output.get('paper_id'),
+        'paper_type': metadata.get('paper_type', 'Unknown'),
+        'file_name': file_name,
+        'total_score': metadata.get('total_score', 0),
+        'confidence': metadata.get('confidence', 0)
+    }
+    return {k: v for k, v in rag_metadata.items() if v is not None}
+
+def process_paper(file_path: str, skip_rag: bool = False, skip_db: bool = False,
+                  file_digest: Optional[str] = None) -> dict:
     """
     Process a research paper using the CLARA-2 scoring framework with caching.
     
@@ -483,73 +757,135 @@ def process_paper(file_path: str, skip_rag: bool = False, skip_db: bool = False)
         file_path: Path to the research paper PDF file
         skip_rag: If True, skip RAG processing
         skip_db: If True, skip database operations
+        file_digest: Precomputed FileCache.file_digest of the file, if available
         
     Returns:
         dict: Processed output with scores and metadata
     """
-    # Validate file exists
-    if not os.path.isfile(file_path):
+    # Validate file exists; the single stat also provides the size that
+    # decides between inline and uploaded evaluation
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        file_stat = None
+    if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
         logger.error(f"File not found: {file_path}")
         raise FileNotFoundError(f"File not found: {file_path}")
-
-    # Check cache first
+    
+    # Computed once and passed to every step that records the file name
+    file_name = os.path.basename(file_path)
+    
+    cache = None
     if CACHE_AVAILABLE:
         try:
             cache = get_cache()
-            cached_result = cache.get(file_path)
-            
-            if cached_result:
-                logger.info(f"🚀 Using cached result for {Path(file_path).name}")
-                
-                # Still perform RAG and DB operations if needed and not skipped
-                if not skip_rag and RAG_AVAILABLE:
-                    try:
-                        logger.info("🚀 Starting RAG processing for cached result...")
-                        rag_metadata = {
-                            'paper_id': cached_result.get('paper_id'),
-                            'paper_type': cached_result.get('metadata', {}).get('paper_type', 'Unknown'),
-                            'file_name': os.path.basename(file_path),
-                            'total_score': cached_result.get('metadata', {}).get('total_score', 0),
-                            'confidence': cached_result.get('metadata', {}).get('confidence', 0)
-                        }
-                        
-                        rag_metadata = {k: v for k, v in rag_metadata.items() if v is not None}
-                        logger.info(f"📋 RAG metadata prepared: {rag_metadata}")
-                        
-                        rag_result = ingestion_docs_doctor(
-                            file=file_path,
-                            rating_metadata=rag_metadata
-                        )
-                        logger.info(f"✅ RAG processing completed: {rag_result}")
-                        cached_result['rag_processed'] = True
-                    except Exception as e:
-                        logger.error(f"❌ RAG processing failed: {e}")
-                        cached_result['rag_processed'] = False
-                        cached_result['rag_error'] = str(e)
-                
-                if not skip_db and DB_AVAILABLE and not cached_result.get('paper_id'):
-                    try:
-                        paper_id = save_to_database(cached_result, file_path)
-                        if paper_id:
-                            logger.info(f"✅ Saved cached result to database with ID: {paper_id}")
-                            cached_result['paper_id'] = paper_id
-                    except Exception as e:
-                        logger.error(f"❌ Database save failed for cached result: {e}")
-                
-                return cached_result
-                
+            if file_digest is None and cache.strict:
+                # Hash once here and reuse the digest for the lock, lookup and set
+                file_digest = cache.file_digest(file_path)
         except Exception as e:
-            logger.warning(f"⚠️ Cache check failed: {e}. Proceeding with normal processing.")
+            logger.warning(f"⚠️ Cache unavailable: {e}. Proceeding with normal processing.")
+            cache = None
+    
+    rag_enabled = RAG_AVAILABLE and not skip_rag
+    
+    # Concurrent requests for the same paper, in this or another worker, wait
+    # for the first one's score instead of each running CLARA-2. Only the
+    # lookup, the evaluation and the cache write are serialized; RAG
+    # ingestion and the DB save run after the lock is released
+    entry_lock = cache.entry_lock(file_path, digest=file_digest) if cache is not None else contextlib.nullcontext()
+    with entry_lock:
+        cached_result = _get_cached_result(cache, file_path, file_digest)
+        if cached_result is None:
+            start_time = time.time()
+            logger.info(f"🔄 Processing {file_name} from scratch")
+            
+            # Chunk the PDF for RAG in the background while the CLARA-2
+            # evaluation is in flight, instead of parsing it after the LLM
+            # call returns
+            chunk_future = _chunk_executor.submit(chunk_document, file_path) if rag_enabled else None
+            processed_output, uploaded_file = _evaluate_paper(file_path, file_name, file_stat)
+            _cache_result(cache, file_path, processed_output, file_digest)
+    
+    if cached_result is not None:
+        logger.info(f"🚀 Using cached result for {file_name}")
+        return _complete_cached_result(cached_result, file_path, file_name, skip_rag, skip_db, file_digest)
+    
+    _complete_result(processed_output, file_path, file_name, skip_rag, skip_db, file_digest,
+                     chunk_future, uploaded_file)
+    
+    # Cache again with the RAG status and paper_id, so later hits skip the DB save
+    _cache_result(cache, file_path, processed_output, file_digest)
+    
+    processing_time = time.time() - start_time
+    logger.info(f"✅ Processing completed for {file_name} in {processing_time:.2f}s")
+    
+    return processed_output
 
-    # Normal processing flow (no cache or cache miss)
-    start_time = time.time()
-    logger.info(f"🔄 Processing {Path(file_path).name} from scratch")
+def _get_cached_result(cache: Optional["FileCache"], file_path: str,
+                       file_digest: Optional[str]) -> Optional[dict]:
+    """
+    Look up a paper's cached result.
     
-    # Upload the file to OpenAI
-    uploaded_file = upload_file_to_openai(file_path)
+    Entries are keyed on the caller's content digest when given (uploads land
+    at a fresh path each time), otherwise on the file's stat fingerprint, so
+    the file is never read just for the lookup.
+    """
+    if cache is None:
+        return None
+    try:
+        return cache.get(file_path, digest=file_digest)
+    except Exception as e:
+        logger.warning(f"⚠️ Cache check failed: {e}. Proceeding with normal processing.")
+        return None
+
+def _cache_result(cache: Optional["FileCache"], file_path: str, processed_output: dict,
+                  file_digest: Optional[str]):
+    """Store a paper's result in the file cache, if caching is available."""
+    if cache is None:
+        return
+    try:
+        cache.set(file_path, processed_output, digest=file_digest)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to cache result: {e}")
+
+def _evaluate_paper(file_path: str, file_name: str, file_stat: os.stat_result) -> tuple:
+    """
+    Score a paper with CLARA-2, unless the semantic cache knows a copy of it.
+    
+    Args:
+        file_path: Path to the research paper PDF file
+        file_name: Base name of the file
+        file_stat: Stat result of the file
+        
+    Returns:
+        tuple: The processed output, and the OpenAI file the paper was
+        uploaded as (None if it was sent inline or not evaluated)
+    """
+    # A renamed or re-exported copy of an already scored paper misses the
+    # file cache; match it on its text before paying for a CLARA-2 run.
+    # The paper is embedded once; a miss reuses the vector to cache the result
+    paper_vector = None
+    processed_output = None
+    if SEMANTIC_CACHE_AVAILABLE:
+        try:
+            semantic_cache = get_semantic_cache(get_client(), scorer_key=f"{CLARA_MODEL}|{CLARA_PROMPT_HASH}")
+            paper_vector = semantic_cache.embed(extract_paper_text(file_path))
+            processed_output = semantic_cache.get(paper_vector)
+        except Exception as e:
+            logger.warning(f"⚠️ Semantic cache check failed: {e}")
     
-    # Run CLARA-2 evaluation
-    result_text = run_clara_evaluation(uploaded_file)
+    uploaded_file = None
+    if processed_output:
+        logger.info(f"🚀 Using semantically cached result for {file_name}")
+        return processed_output, uploaded_file
+    
+    # Run CLARA-2 evaluation; small PDFs go inline in the request, larger
+    # ones are uploaded to OpenAI first
+    if file_stat.st_size < INLINE_FILE_MAX_BYTES:
+        result_text = run_clara_evaluation_inline(file_path, file_name)
+    else:
+        uploaded_file = upload_file_to_openai(file_path, file_name)
+        result_text = run_clara_evaluation(uploaded_file)
     
     # Process the result
     processed_output = process_rater_output(result_text)
@@ -557,34 +893,69 @@ def process_paper(file_path: str, skip_rag: bool = False, skip_db: bool = False)
     if not processed_output:
         raise ValueError("Failed to process rater output")
     
-    # Save to database if enabled
+    if paper_vector is not None:
+        semantic_cache.put(paper_vector, processed_output)
+    return processed_output, uploaded_file
+
+def _complete_cached_result(cached_result: dict, file_path: str, file_name: str, skip_rag: bool,
+                            skip_db: bool, file_digest: Optional[str]) -> dict:
+    """Run the RAG and DB steps still needed for a cached result."""
+    # The DB save runs in the background alongside RAG ingestion
+    db_future = None
+    if not skip_db and DB_AVAILABLE and not cached_result.get('paper_id'):
+        db_future = _background_executor.submit(save_to_database, cached_result, file_path, file_name)
+    
+    if not skip_rag and RAG_AVAILABLE:
+        try:
+            logger.info("🚀 Starting RAG processing for cached result...")
+            rag_metadata = _build_rag_metadata(cached_result, file_name)
+            logger.info(f"📋 RAG metadata prepared: {rag_metadata}")
+            
+            rag_result = ingestion_docs_doctor(
+                file=file_path,
+                rating_metadata=rag_metadata,
+                doc_id=file_digest
+            )
+            logger.info(f"✅ RAG processing completed: {rag_result}")
+            cached_result['rag_processed'] = True
+        except Exception as e:
+            logger.error(f"❌ RAG processing failed: {e}")
+            cached_result['rag_processed'] = False
+            cached_result['rag_error'] = str(e)
+    
+    if db_future is not None:
+        try:
+            paper_id = db_future.result()
+            if paper_id:
+                logger.info(f"✅ Saved cached result to database with ID: {paper_id}")
+                cached_result['paper_id'] = paper_id
+        except Exception as e:
+            logger.error(f"❌ Database save failed for cached result: {e}")
+    
+    return cached_result
+
+def _complete_result(processed_output: dict, file_path: str, file_name: str, skip_rag: bool,
+                     skip_db: bool, file_digest: Optional[str], chunk_future, uploaded_file):
+    """Save a freshly evaluated result to the database and ingest the paper for RAG."""
+    # Save to database in the background while RAG ingestion runs; the two
+    # are independent, so the RAG metadata no longer carries the paper_id
+    db_future = None
     if DB_AVAILABLE and not skip_db:
-        paper_id = save_to_database(processed_output, file_path)
-        if paper_id:
-            logger.info(f"✅ Successfully saved to database with ID: {paper_id}")
-            processed_output['paper_id'] = paper_id
+        db_future = _background_executor.submit(save_to_database, processed_output, file_path, file_name)
     
     # Process with RAG if enabled
     logger.info(f"🔍 Checking RAG availability - RAG_AVAILABLE: {RAG_AVAILABLE}")
-    if RAG_AVAILABLE:
+    if chunk_future is not None:
         try:
             logger.info("🚀 Starting RAG processing...")
-            # Ensure all metadata values are serializable and not None
-            rag_metadata = {
-                'paper_id': processed_output.get('paper_id'),
-                'paper_type': processed_output.get('metadata', {}).get('paper_type', 'Unknown'),
-                'file_name': os.path.basename(file_path),
-                'total_score': processed_output.get('metadata', {}).get('total_score', 0),
-                'confidence': processed_output.get('metadata', {}).get('confidence', 0)
-            }
-            
-            # Filter out any None values
-            rag_metadata = {k: v for k, v in rag_metadata.items() if v is not None}
+            rag_metadata = _build_rag_metadata(processed_output, file_name)
             logger.info(f"📋 RAG metadata prepared: {rag_metadata}")
             
             rag_result = ingestion_docs_doctor(
                 file=file_path,
-                rating_metadata=rag_metadata
+                rating_metadata=rag_metadata,
+                chunks=chunk_future.result(),
+                doc_id=file_digest
             )
             logger.info(f"✅ RAG processing completed: {rag_result}")
             processed_output['rag_processed'] = True
@@ -594,24 +965,142 @@ def process_paper(file_path: str, skip_rag: bool = False, skip_db: bool = False)
             logger.error(f"📚 RAG Error traceback: {traceback.format_exc()}")
             processed_output['rag_processed'] = False
             processed_output['rag_error'] = str(e)
+    elif skip_rag:
+        processed_output['rag_processed'] = False
     else:
         logger.warning("⚠️ RAG processing skipped - RAG Service not available")
         processed_output['rag_processed'] = False
         processed_output['rag_error'] = 'RAG Service not available in production'
     
-    # Delete the file from OpenAI
-    delete_file_from_openai(uploaded_file)
+    # Wait for the database save to finish
+    if db_future is not None:
+        paper_id = db_future.result()
+        if paper_id:
+            logger.info(f"✅ Successfully saved to database with ID: {paper_id}")
+            processed_output['paper_id'] = paper_id
     
-    # Cache the result
-    if CACHE_AVAILABLE:
-        try:
-            cache = get_cache()
-            cache.set(file_path, processed_output)
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to cache result: {e}")
+    # Delete the file from OpenAI in the background; the result doesn't
+    # depend on it, so the caller doesn't wait for the extra round trip
+    if uploaded_file is not None:
+        _background_executor.submit(delete_file_from_openai, uploaded_file)
+
+
+# Block size used when writing uploaded streams to disk
+STREAM_CHUNK_SIZE = 1 << 20
+
+def process_paper_stream(file_obj, file_path: str, skip_rag: bool = False, skip_db: bool = False) -> dict:
+    """
+    Write an uploaded PDF stream to disk and process it.
     
-    processing_time = time.time() - start_time
-    logger.info(f"✅ Processing completed for {Path(file_path).name} in {processing_time:.2f}s")
+    The stream is hashed while it is written, so the cache lookup does not
+    read the file back. The written file is removed once processing ends.
     
-    return processed_output
+    Args:
+        file_obj: Binary file object supporting readinto, e.g. an UploadFile's file
+        file_path: Path to write the PDF to; its name is the paper's file name
+        skip_rag: If True, skip RAG processing
+        skip_db: If True, skip database operations
+        
+    Returns:
+        dict: Processed output with scores and metadata
+    """
+    hasher = FileCache.new_hasher() if CACHE_AVAILABLE else None
+    # One reusable block instead of a fresh bytes object per read
+    view = memoryview(bytearray(STREAM_CHUNK_SIZE))
+    try:
+        with open(file_path, "wb") as out:
+            while n := file_obj.readinto(view):
+                chunk = view[:n]
+                if hasher is not None:
+                    hasher.update(chunk)
+                out.write(chunk)
+        
+        file_digest = hasher.hexdigest() if hasher is not None else None
+        return process_paper(file_path, skip_rag, skip_db, file_digest=file_digest)
+    finally:
+        Path(file_path).unlink(missing_ok=True)
 
+async def process_papers(file_paths: list, max_concurrency: int = 8,
+                         skip_rag: bool = False, skip_db: bool = False) -> list:
+    """
+    Process several research papers concurrently.
+    
+    Each paper runs through ``process_paper`` in a worker thread, so the
+    OpenAI round trips of up to ``max_concurrency`` papers overlap instead
+    of being paid one after another.
+    
+    Args:
+        file_paths: Paths to the research paper PDF files
+        max_concurrency: Maximum number of papers processed at once
+        skip_rag: If True, skip RAG processing
+        skip_db: If True, skip database operations
+        
+    Returns:
+        list: One entry per path, in order - the processed output, or the
+        exception raised while processing that paper
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def _process_one(file_path):
+        async with semaphore:
+            return await asyncio.to_thread(process_paper, file_path, skip_rag, skip_db)
+    
+    logger.info(f"🔄 Processing {len(file_paths)} papers with concurrency {max_concurrency}")
+    return await asyncio.gather(*(_process_one(p) for p in file_paths), return_exceptions=True)
+
+def process_papers_batch(file_paths: list, skip_db: bool = False,
+                         poll_interval: float = BATCH_POLL_INTERVAL) -> dict:
+    """
+    Score research papers through the OpenAI Batch API.
+    
+    Intended for non-interactive bulk runs: blocks until the batch completes
+    (up to 24h). RAG ingestion is not performed here; run ``ingest_many``
+    over the results once they are available.
+    
+    Args:
+        file_paths: Paths to the research paper PDF files
+        skip_db: If True, skip database operations
+        poll_interval: Seconds between batch status checks
+        
+    Returns:
+        dict: Processed output per file path; papers whose evaluation failed
+        are omitted
+    """
+    uploaded = {}
+    for file_path in file_paths:
+        uploaded_file = upload_file_to_openai(file_path)
+        uploaded[uploaded_file.id] = (file_path, uploaded_file)
+    
+    results = {}
+    try:
+        batch_id = submit_batch(list(uploaded))
+        # closing() runs collect_batch's file cleanup as soon as this loop
+        # exits, including on errors
+        with contextlib.closing(collect_batch(batch_id, poll_interval)) as outputs:
+            for file_id, result_text in outputs:
+                file_path = uploaded[file_id][0]
+                processed_output = process_rater_output(result_text) if result_text else None
+                if not processed_output:
+                    logger.error(f"❌ No usable evaluation for {Path(file_path).name}")
+                    continue
+                
+                if DB_AVAILABLE and not skip_db:
+                    paper_id = save_to_database(processed_output, file_path)
+                    if paper_id:
+                        processed_output['paper_id'] = paper_id
+                
+                if CACHE_AVAILABLE:
+                    try:
+                        # Key on content, like uploads, so their lookups find it
+                        cache = get_cache()
+                        cache.set(file_path, processed_output, digest=cache.file_digest(file_path))
+                    except Exception as e:
+                        logger.warning(f"⚠️ Failed to cache result: {e}")
+                
+                results[file_path] = processed_output
+    finally:
+        for _, uploaded_file in uploaded.values():
+            _background_executor.submit(delete_file_from_openai, uploaded_file)
+    
+    logger.info(f"✅ Batch scoring completed for {len(results)}/{len(file_paths)} papers")
+    return results
@@ -1,14 +1,20 @@
 import os
+import asyncio
 import boto3
 import logging
+import threading
+import time
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict, Any
+from itertools import islice
+from typing import List, Optional, Tuple, Dict, Any, Iterator
 from botocore.config import Config as BotoConfig
-from botocore.exceptions import ClientError, BotoCoreError
-import hashlib
+from botocore.exceptions import ClientError, BotoCoreError, ConnectTimeoutError, ReadTimeoutError
 
-from .config import config
+from .config import S3_CONFIG, PROCESSING_CONFIG
 
 # Configure logging
 logging.basicConfig(
@@ -17,29 +23,116 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Downloads go through an AWS Common Runtime transfer manager when awscrt
+# (boto3[crt]) is installed: ranged GETs run in native code off the GIL.
+# Without it the pure-Python s3transfer threads are used.
+try:
+    import awscrt  # noqa: F401
+    from boto3.s3.transfer import create_crt_transfer_manager, ProgressCallbackInvoker
+    CRT_AVAILABLE = True
+except ImportError:
+    CRT_AVAILABLE = False
+
+SECONDS_PER_DAY = 86400
+
+class _ByteCounter:
+    """Transfer callback that totals the bytes received and forwards each report."""
+    
+    def __init__(self, forward):
+        self.total = 0
+        self._forward = forward
+        self._lock = threading.Lock()
+    
+    def __call__(self, bytes_transferred: int):
+        # Reports can be negative when a part is retried
+        with self._lock:
+            self.total += bytes_transferred
+        self._forward(bytes_transferred)
+
+class AdaptiveConcurrency:
+    """
+    Hill-climbing controller for the per-transfer download concurrency.
+    
+    Bytes reported by transfer callbacks are summed over fixed windows. After
+    each window the concurrency keeps moving in the same direction while
+    throughput improves, reverses when it drops, and steps down on stalls
+    and timeouts.
+    """
+    
+    def __init__(self, initial: int = 10, minimum: int = 2, maximum: int = 64, interval: float = 2.0):
+        self.current = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._window_bytes = 0
+        self._window_start = time.monotonic()
+        self._last_throughput = 0.0
+        self._direction = 1
+    
+    def _clamp(self, value: int) -> int:
+        return max(self.minimum, min(self.maximum, value))
+    
+    def record(self, bytes_transferred: int):
+        """Transfer callback: account bytes and adjust once per window."""
+        with self._lock:
+            self._window_bytes += bytes_transferred
+            now = time.monotonic()
+            elapsed = now - self._window_start
+            if elapsed < self.interval:
+                return
+            throughput = self._window_bytes / elapsed
+            if throughput < self._last_throughput:
+                self._direction = -self._direction
+            self.current = self._clamp(self.current + self._direction)
+            self._last_throughput = throughput
+            self._window_bytes = 0
+            self._window_start = now
+    
+    def backoff(self):
+        """Step down after a timeout, which indicates too many parallel requests."""
+        with self._lock:
+            self.current = self._clamp(self.current - 1)
+            self._direction = -1
+
 class S3Service:
     def __init__(self):
         """Initialize with secure defaults."""
-        s3_config = config.s3_config
+        s3_config = S3_CONFIG
         self.bucket_name = s3_config['bucket_name']
-        self.download_dir = s3_config['download_dir']
+        self.download_dir = Path(s3_config['download_dir'])
         self.prefix = s3_config['prefix']
-        self.max_daily_downloads = config.processing_config['max_daily_downloads']
-        self.supported_file_types = set(config.processing_config['supported_file_types'])
-        self.chunk_size = config.processing_config['chunk_size']
+        self.max_daily_downloads = PROCESSING_CONFIG['max_daily_downloads']
+        self.supported_file_types = set(PROCESSING_CONFIG['supported_file_types'])
+        self.multipart_threshold = PROCESSING_CONFIG['multipart_threshold']
+        self.multipart_chunksize = PROCESSING_CONFIG['multipart_chunksize']
+        self.io_chunksize = PROCESSING_CONFIG['io_chunksize']
+        self.max_io_queue = PROCESSING_CONFIG['max_io_queue']
+        self.max_workers = PROCESSING_CONFIG['max_workers']
+        self._concurrency = AdaptiveConcurrency(initial=16)
         
-        # Initialize S3 client with secure configuration
+        # Initialize S3 client with secure configuration; the client is
+        # thread-safe and shared by all download workers
         self.s3_client = self._create_s3_client()
+        self._crt_manager = self._create_crt_manager()
         
-        # Track downloads
+        # Track downloads; the counter is shared by the download workers
+        self._counter_lock = threading.Lock()
         self._reset_daily_counter()
+        
+        # ETags of already downloaded objects, so unchanged objects are skipped
+        self._etag_lock = threading.Lock()
+        self._etag_db = self._open_etag_cache()
     
     def _create_s3_client(self):
         """Create a secure S3 client with appropriate configuration."""
-        s3_config = config.s3_config
+        s3_config = S3_CONFIG
         boto_config = BotoConfig(
             region_name=s3_config['region_name'],
             signature_version='s3v4',
+            # One connection per download worker plus the multipart threads
+            # of each transfer, so workers don't wait on the pool
+            max_pool_connections=self.max_workers * 10,
             retries={
                 'max_attempts': 3,
                 'mode': 'standard'
@@ -57,38 +150,116 @@ class S3Service:
             config=boto_config
         )
     
+    def _create_crt_manager(self):
+        """
+        Create the CRT transfer manager shared by all downloads.
+        
+        Returns:
+            The manager, or None when awscrt is missing or boto3 can't serve
+            this client's credentials and region through CRT
+        """
+        if not CRT_AVAILABLE:
+            return None
+        try:
+            manager = create_crt_transfer_manager(self.s3_client, boto3.s3.transfer.TransferConfig())
+        except Exception as e:
+            logger.warning(f"CRT transfer manager unavailable, using s3transfer: {e}")
+            return None
+        if manager is not None:
+            logger.info("Using the CRT transfer manager for S3 downloads")
+        return manager
+    
+    def _open_etag_cache(self) -> sqlite3.Connection:
+        """Open the SQLite cache mapping S3 keys to the ETag last downloaded."""
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.download_dir / '.etag_cache.sqlite', check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS etags ('
+            'key TEXT PRIMARY KEY, etag TEXT NOT NULL, size INTEGER, mtime REAL, local_path TEXT NOT NULL)'
+        )
+        conn.commit()
+        return conn
+    
+    def _get_unchanged_path(self, s3_key: str, etag: Optional[str]) -> Optional[Path]:
+        """Return the local copy of an object if it was downloaded with the same ETag."""
+        if not etag:
+            return None
+        with self._etag_lock:
+            row = self._etag_db.execute(
+                'SELECT etag, local_path FROM etags WHERE key = ?', (s3_key,)
+            ).fetchone()
+        if row and row[0] == etag and Path(row[1]).exists():
+            return Path(row[1])
+        return None
+    
+    def _record_etag(self, s3_key: str, etag: str, local_path: Path):
+        """Remember the ETag of a completed download."""
+        st = local_path.stat()
+        with self._etag_lock:
+            self._etag_db.execute(
+                'INSERT OR REPLACE INTO etags (key, etag, size, mtime, local_path) VALUES (?, ?, ?, ?, ?)',
+                (s3_key, etag, st.st_size, st.st_mtime, str(local_path))
+            )
+            self._etag_db.commit()
+    
     def _reset_daily_counter(self):
         """Reset the daily download counter."""
         self.daily_downloads = 0
         self.last_reset_date = datetime.utcnow().date()
+        # Unix time has no leap seconds, so UTC days are exact multiples of
+        # 86400; the limit checks compare against this with a plain time.time()
+        now = time.time()
+        self._next_reset_epoch = now - now % SECONDS_PER_DAY + SECONDS_PER_DAY
         logger.info("Daily download counter reset")
     
     def _can_download(self) -> bool:
         """Check if we can proceed with downloads."""
-        if datetime.utcnow().date() > self.last_reset_date:
-            self._reset_daily_counter()
-        return self.daily_downloads < self.max_daily_downloads
+        with self._counter_lock:
+            if time.time() >= self._next_reset_epoch:
+                self._reset_daily_counter()
+            return self.daily_downloads < self.max_daily_downloads
+    
+    def _reserve_download(self) -> bool:
+        """Atomically claim one slot of the daily download limit."""
+        with self._counter_lock:
+            if time.time() >= self._next_reset_epoch:
+                self._reset_daily_counter()
+            if self.daily_downloads >= self.max_daily_downloads:
+                return False
+            self.daily_downloads += 1
+            return True
+    
+    def _release_download(self):
+        """Give back a slot claimed by a download that failed."""
+        with self._counter_lock:
+            self.daily_downloads = max(0, self.daily_downloads - 1)
     
-    def list_files(self) -> List[Dict[str, Any]]:
-        """List files in S3 bucket with basic validation."""
+    def list_files(self) -> Iterator[Dict[str, Any]]:
+        """
+        List files in S3 bucket with basic validation.
+        
+        Pages through the whole listing lazily, so callers can start on the
+        first objects before the rest of the bucket has been listed.
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(
+            Bucket=self.bucket_name,
+            Prefix=self.prefix,
+            PaginationConfig={'PageSize': 1000}
+        )
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=self.prefix,
-                MaxKeys=1000  # Limit number of objects returned
-            )
-            return [
-                {
-                    'key': obj['Key'],
-                    'size': obj['Size'],
-                    'last_modified': obj['LastModified']
-                }
-                for obj in response.get('Contents', [])
-                if self._is_valid_file(obj)
-            ]
+            for page in pages:
+                for obj in page.get('Contents', []):
+                    if self._is_valid_file(obj):
+                        yield {
+                            'key': obj['Key'],
+                            'size': obj['Size'],
+                            'last_modified': obj['LastModified'],
+                            'etag': obj.get('ETag')
+                        }
         except (ClientError, BotoCoreError) as e:
             logger.error(f"Error listing S3 files: {e}")
-            return []
     
     def _is_valid_file(self, obj: Dict[str, Any]) -> bool:
         """Validate if the S3 object is a supported file."""
@@ -103,19 +274,25 @@ class S3Service:
             return ""
         return os.path.basename(s3_key)
     
-    def download_file(self, s3_key: str) -> Optional[Path]:
+    def download_file(self, s3_key: str, etag: Optional[str] = None,
+                      size: Optional[int] = None) -> Optional[Path]:
         """
         Securely download a file from S3.
         
         Args:
             s3_key: The S3 object key to download
+            etag: The object's ETag from the listing; if it matches the last
+                download, the existing local copy is returned without a GET
+            size: The object's size from the listing, used to preallocate
+                the local file
             
         Returns:
             Path to the downloaded file if successful, None otherwise
         """
-        if not self._can_download():
-            logger.warning(f"Daily download limit of {self.max_daily_downloads} reached")
-            return None
+        unchanged_path = self._get_unchanged_path(s3_key, etag)
+        if unchanged_path:
+            logger.info(f"Skipping unchanged {s3_key}, using {unchanged_path}")
+            return unchanged_path
         
         file_name = self._sanitize_filename(s3_key)
         if not file_name:
@@ -126,43 +303,99 @@ class S3Service:
         if not file_ext or file_ext not in self.supported_file_types:
             logger.warning(f"Skipping unsupported file type: {file_name}")
             return None
-            
-        local_path = self.download_dir / file_name
-        temp_path = local_path.with_suffix(f'.{self._generate_temp_suffix()}')
+        
+        if not self._reserve_download():
+            logger.warning(f"Daily download limit of {self.max_daily_downloads} reached")
+            return None
+        
+        # The local path mirrors the full key, so objects sharing a basename
+        # under different prefixes never share (or overwrite) a file
+        local_path = self._local_path(s3_key)
+        tmp_path = None
         
         try:
-            # Download to temp file first
-            self._download_to_temp(s3_key, temp_path)
+            # Download into a temporary file next to the final one and rename
+            # it over the previous copy only once it is complete and verified,
+            # so a failed re-download leaves the last good copy in place
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._download_to_temp(s3_key, local_path, size)
             
             # Verify download
-            if not self._verify_download(temp_path):
+            if not self._verify_download(tmp_path):
                 raise Exception("Download verification failed")
+            os.replace(tmp_path, local_path)
+            tmp_path = None
                 
-            # Rename temp to final filename
-            temp_path.rename(local_path)
-            self.daily_downloads += 1
+            if etag:
+                self._record_etag(s3_key, etag, local_path)
             
             logger.info(f"Downloaded {s3_key} to {local_path}")
             return local_path
             
         except Exception as e:
             logger.error(f"Failed to download {s3_key}: {e}")
-            self._cleanup_failed_download(temp_path)
+            self._release_download()
+            if tmp_path is not None:
+                self._cleanup_failed_download(tmp_path)
             return None
     
-    def _download_to_temp(self, s3_key: str, temp_path: Path):
-        """Download file to temporary location."""
-        with open(temp_path, 'wb') as f:
-            self.s3_client.download_fileobj(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Fileobj=f,
-                Config=boto3.s3.transfer.TransferConfig(
-                    multipart_chunksize=self.chunk_size,
-                    max_concurrency=10,
-                    use_threads=True
-                )
-            )
+    def _local_path(self, s3_key: str) -> Path:
+        """Local path of an object: its full key below the download directory."""
+        return self.download_dir.joinpath(*(part for part in s3_key.split('/') if part))
+    
+    def _download_to_temp(self, s3_key: str, local_path: Path, size: Optional[int] = None) -> Path:
+        """Download an object into a new temporary file in ``local_path``'s directory and return its path."""
+        fd, tmp_name = tempfile.mkstemp(dir=local_path.parent, prefix=f".{local_path.name}.", suffix=".part")
+        tmp_path = Path(tmp_name)
+        if size and hasattr(os, 'posix_fallocate'):
+            # Reserve the blocks up front so the parallel part writes don't
+            # fragment the file or fail midway on a full disk
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError:
+                pass
+        
+        # Parts are written at their offsets in any order, so the file length
+        # is taken from the bytes actually received: if the object shrank
+        # since it was listed, the preallocated tail is cut off. The CRT
+        # client sizes its own concurrency, so only s3transfer downloads feed
+        # the adaptive controller
+        received = _ByteCounter(self._concurrency.record if self._crt_manager is None else lambda n: None)
+        
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if self._crt_manager is not None:
+                    self._crt_manager.download(
+                        self.bucket_name, s3_key, f, subscribers=[ProgressCallbackInvoker(received)]
+                    ).result()
+                else:
+                    # The transfer config is rebuilt per call with the
+                    # concurrency the adaptive controller currently considers best
+                    self.s3_client.download_fileobj(
+                        Bucket=self.bucket_name,
+                        Key=s3_key,
+                        Fileobj=f,
+                        Config=boto3.s3.transfer.TransferConfig(
+                            multipart_threshold=self.multipart_threshold,
+                            multipart_chunksize=self.multipart_chunksize,
+                            max_concurrency=self._concurrency.current,
+                            io_chunksize=self.io_chunksize,
+                            max_io_queue=self.max_io_queue,
+                            use_threads=True
+                        ),
+                        Callback=received
+                    )
+                f.truncate(received.total)
+                f.flush()
+                os.fsync(f.fileno())
+        except (ConnectTimeoutError, ReadTimeoutError):
+            self._concurrency.backoff()
+            self._cleanup_failed_download(tmp_path)
+            raise
+        except BaseException:
+            self._cleanup_failed_download(tmp_path)
+            raise
+        return tmp_path
     
     @staticmethod
     def _verify_download(file_path: Path, min_size: int = 100) -> bool:
@@ -181,11 +414,6 @@ class S3Service:
         except OSError as e:
             logger.warning(f"Failed to clean up {file_path}: {e}")
     
-    @staticmethod
-    def _generate_temp_suffix() -> str:
-        """Generate a random suffix for temp files."""
-        return hashlib.md5(str(datetime.utcnow().timestamp()).encode()).hexdigest()[:8]
-    
     def process_new_files(self) -> List[Path]:
         """
         Process new files from S3 bucket up to the daily limit.
@@ -196,19 +424,29 @@ class S3Service:
         downloaded_files = []
         
         try:
-            # Get list of files from S3
-            s3_files = self.list_files()
-            logger.info(f"Found {len(s3_files)} files in S3 bucket")
+            # Stream the listing from S3; objects whose ETag matches their
+            # last download are not new
+            new_files = (
+                file_info for file_info in self.list_files()
+                if not self._get_unchanged_path(file_info['key'], file_info['etag'])
+            )
             
-            # Process files until we reach the daily limit
-            for file_info in s3_files:
-                if not self._can_download():
+            # Download concurrently as the listing arrives, submitting no more
+            # files than the remaining daily limit allows; download_file
+            # enforces the limit itself, so a failed download frees its slot
+            remaining = self.get_remaining_daily_downloads()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(self.download_file, file_info['key'], file_info['etag'], file_info['size'])
+                    for file_info in islice(new_files, remaining)
+                ]
+                logger.info(f"Queued {len(futures)} new or changed files for download")
+                if next(new_files, None) is not None:
                     logger.info("Daily download limit reached")
-                    break
-                    
-                local_path = self.download_file(file_info['key'])
-                if local_path:
-                    downloaded_files.append(local_path)
+                for future in as_completed(futures):
+                    local_path = future.result()
+                    if local_path:
+                        downloaded_files.append(local_path)
                     
         except Exception as e:
             logger.error(f"Error processing files: {e}")
@@ -216,10 +454,49 @@ class S3Service:
         logger.info(f"Successfully downloaded {len(downloaded_files)} files")
         return downloaded_files
     
+    async def process_new_files_async(self, max_concurrency: int = 32) -> List[Path]:
+        """
+        Async variant of ``process_new_files`` for callers running an event loop.
+        
+        Downloads run on worker threads through the same thread-safe client,
+        with an ``asyncio.Semaphore`` bounding how many are in flight. If
+        timeouts appear on slow links, lower ``max_concurrency`` (down to 1).
+        
+        Returns:
+            List of paths to successfully downloaded files
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        def _list_new_files():
+            new_files = (
+                file_info for file_info in self.list_files()
+                if not self._get_unchanged_path(file_info['key'], file_info['etag'])
+            )
+            return list(islice(new_files, self.get_remaining_daily_downloads()))
+        
+        async def _download_one(file_info):
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self.download_file, file_info['key'], file_info['etag'], file_info['size']
+                )
+        
+        try:
+            s3_files = await asyncio.to_thread(_list_new_files)
+            logger.info(f"Queued {len(s3_files)} new or changed files for download")
+            results = await asyncio.gather(*(_download_one(file_info) for file_info in s3_files))
+        except Exception as e:
+            logger.error(f"Error processing files: {e}")
+            return []
+        
+        downloaded_files = [local_path for local_path in results if local_path]
+        logger.info(f"Successfully downloaded {len(downloaded_files)} files")
+        return downloaded_files
+    
     def get_remaining_daily_downloads(self) -> int:
         """Get the number of remaining downloads for the current day."""
         self._can_download()  # This will reset counter if needed
-        return max(0, self.max_daily_downloads - self.daily_downloads)
+        with self._counter_lock:
+            return max(0, self.max_daily_downloads - self.daily_downloads)
 
 
 def main():
@@ -0,0 +1,204 @@
+import os
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+import numpy as np
+import orjson
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Cosine similarity above which two papers are treated as the same paper
+SEMANTIC_CACHE_TAU = float(os.getenv("SEMANTIC_CACHE_TAU", "0.97"))
+# Only the opening pages are embedded: they carry the title, authors and
+# abstract, and stay well inside the embedding model's input limit
+MAX_TEXT_PAGES = 3
+MAX_TEXT_CHARS = 20000
+# SQLite database in the cache directory holding every vector and result
+INDEX_FILE_NAME = "index.db"
+# Entries older than this are ignored and purged, so a paper is re-scored
+# periodically instead of serving the same result forever
+SEMANTIC_CACHE_TTL_HOURS = float(os.getenv("SEMANTIC_CACHE_TTL_HOURS", "24"))
+
+def extract_paper_text(file_path: str, max_pages: int = MAX_TEXT_PAGES) -> str:
+    """Extract the text of the first pages of a PDF for semantic matching."""
+    reader = PdfReader(file_path)
+    pages = reader.pages[:max_pages]
+    return "\n".join(page.extract_text() or "" for page in pages)[:MAX_TEXT_CHARS]
+
+class SemanticCache:
+    """
+    Cache of CLARA-2 results keyed by an embedding of the paper text, so a
+    renamed or re-exported copy of an already scored paper reuses its result.
+
+    Entries are stored in a SQLite table shared by every worker process;
+    each process keeps an in-memory matrix of the vectors and appends the
+    rows other processes added before searching it. Every entry records the
+    scorer that produced it, and only entries of the current scorer that
+    are younger than the TTL are ever returned.
+    """
+
+    def __init__(self, client, cache_dir: str = "semantic_cache", threshold: float = SEMANTIC_CACHE_TAU,
+                 scorer_key: str = "", ttl_hours: float = SEMANTIC_CACHE_TTL_HOURS):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            client: OpenAI client used to embed paper text
+            cache_dir: Directory to persist vectors and results
+            threshold: Minimum cosine similarity for a hit
+            scorer_key: Identifies the model and prompt producing the
+                results; entries cached under another key are never hit
+            ttl_hours: Time-to-live for cache entries in hours
+        """
+        self.client = client
+        self.threshold = threshold
+        # Vectors of another embedding model are not comparable either
+        self.scorer_key = f"{EMBEDDING_MODEL}|{scorer_key}"
+        self.ttl_seconds = ttl_hours * 3600
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = self._open_index()
+        self._vectors = None
+        self._created_at = None
+        self._results = []
+        self._last_id = 0
+        self._purge_expired()
+        self._refresh()
+        logger.info(f"✅ Semantic cache loaded with {len(self._results)} entries")
+
+    def _open_index(self) -> sqlite3.Connection:
+        """Open the SQLite table holding vectors and their results."""
+        conn = sqlite3.connect(self.cache_dir / INDEX_FILE_NAME, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(entries)')}
+        if columns and 'scorer_key' not in columns:
+            # Entries from before scorer keys and timestamps can't be
+            # attributed to a scorer; it is only a cache, so start over
+            conn.execute('DROP TABLE entries')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'id INTEGER PRIMARY KEY, scorer_key TEXT NOT NULL, created_at REAL NOT NULL, '
+            'vector BLOB NOT NULL, result BLOB NOT NULL)'
+        )
+        conn.commit()
+        return conn
+
+    def _purge_expired(self):
+        """Delete the entries of every scorer that are older than the TTL."""
+        try:
+            with self._lock, self._db:
+                purged = self._db.execute(
+                    'DELETE FROM entries WHERE created_at < ?', (time.time() - self.ttl_seconds,)
+                ).rowcount
+            if purged:
+                logger.info(f"🗑️ Purged {purged} expired semantic cache entries")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to purge expired semantic cache entries: {e}")
+
+    def _refresh(self):
+        """Load the entries of this scorer added since the last refresh, by any process."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, created_at, vector, result FROM entries '
+                'WHERE id > ? AND scorer_key = ? AND created_at >= ? ORDER BY id',
+                (self._last_id, self.scorer_key, time.time() - self.ttl_seconds)
+            ).fetchall()
+            if not rows:
+                return
+            new_vectors = np.stack([np.frombuffer(vector, dtype=np.float32) for _, _, vector, _ in rows])
+            new_created_at = np.array([created_at for _, created_at, _, _ in rows])
+            if self._vectors is None:
+                self._vectors, self._created_at = new_vectors, new_created_at
+            else:
+                self._vectors = np.vstack([self._vectors, new_vectors])
+                self._created_at = np.concatenate([self._created_at, new_created_at])
+            self._results.extend(result for _, _, _, result in rows)
+            self._last_id = rows[-1][0]
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embed paper text for ``get`` and ``put``.
+
+        Args:
+            text: Text extracted from the paper
+
+        Returns:
+            An L2-normalized vector, so a dot product is the cosine
+            similarity, or None if the text is blank
+        """
+        if not text.strip():
+            return None
+        response = self.client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def get(self, vector: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached result of the most similar paper.
+
+        Args:
+            vector: ``embed`` result for the paper text
+
+        Returns:
+            A fresh copy of the cached result, or None if no paper is similar enough
+        """
+        if vector is None:
+            return None
+        self._refresh()
+        with self._lock:
+            if self._vectors is None:
+                return None
+            similarities = self._vectors @ vector
+            # Entries loaded earlier may have expired since
+            similarities[self._created_at < time.time() - self.ttl_seconds] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            result = self._results[best]
+        logger.info(f"✅ Semantic cache hit (similarity {similarities[best]:.3f})")
+        return orjson.loads(result)
+
+    def put(self, vector: Optional[np.ndarray], result: Dict[str, Any]) -> bool:
+        """
+        Cache the result for a paper.
+
+        Args:
+            vector: ``embed`` result for the paper text, reused from ``get``
+            result: Processed CLARA-2 output
+
+        Returns:
+            True if cached successfully, False otherwise
+        """
+        if vector is None:
+            return False
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    'INSERT INTO entries (scorer_key, created_at, vector, result) VALUES (?, ?, ?, ?)',
+                    (self.scorer_key, time.time(), vector.astype(np.float32).tobytes(), orjson.dumps(result))
+                )
+            self._refresh()
+            return True
+        except Exception as e:
+            logger.error(f"Error writing semantic cache: {e}")
+            return False
+
+# Global semantic cache instance
+_semantic_cache_instance = None
+_semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache(client, scorer_key: str = "") -> SemanticCache:
+    """Get or create global semantic cache instance."""
+    global _semantic_cache_instance
+    if _semantic_cache_instance is None:
+        with _semantic_cache_lock:
+            if _semantic_cache_instance is None:
+                _semantic_cache_instance = SemanticCache(client, scorer_key=scorer_key)
+    return _semantic_cache_instance
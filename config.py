@@ -13,6 +13,9 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = Field(..., env="DATABASE_URL")
+    # Per worker process; total connections = workers * (pool size + overflow)
+    DB_POOL_SIZE: int = Field(default=5, env="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(default=5, env="DB_MAX_OVERFLOW")
     
     # JWT settings
     SECRET_KEY: SecretStr = Field(..., env="SECRET_KEY")
@@ -4,13 +4,142 @@ from PyPDF2 import PdfReader
 import re
 import logging
 import os
+import mmap
+import bisect
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from dataclasses import dataclass, asdict
+from functools import lru_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patterns used per chunk by _analyze_content and per document by
+# _preprocess_text, compiled once at import
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+_TABLE_RE = re.compile(r'\+[-=]+\+|\|.*\|')
+_LIST_RE = re.compile(r'^\s*[\d•\-*]+\s+\w', re.MULTILINE)
+_CODE_RE = re.compile(r'[{};=]|def\s+\w+\(|class\s+\w+')
+_REFERENCES_RE = re.compile(r'references?\s*$', re.IGNORECASE)
+_CITATION_RE = re.compile(r'\[\d+\]|\([A-Za-z]+,\s*\d{4}\)')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_PAGE_NUMBER_LINE_RE = re.compile(r'\n\d+\n')
+_PAGE_LABEL_RE = re.compile(r'\b(?:page|pg\.?|p\.?)\s*\d+\b', re.IGNORECASE)
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_MULTI_SPACE_RE = re.compile(r' {2,}')
+_BULLET_RE = re.compile(r'\s*[-•*]\s*')
+
+@lru_cache(maxsize=4096)
+def _analyze_text(text: str) -> Dict[str, Any]:
+    """
+    Compute the content-analysis metadata of a chunk.
+
+    Results are cached per text, since re-chunking a document or overlapping
+    windows produce the same chunk repeatedly. Callers must not mutate the
+    returned dict.
+    """
+    words = text.split()
+    word_count = len(words)
+    sentences = [s for s in _SENTENCE_SPLIT_RE.split(text) if s.strip()]
+    sentence_count = len(sentences)
+    
+    return {
+        'word_count': word_count,
+        'sentence_count': sentence_count,
+        'avg_word_length': sum(map(len, words)) / max(1, word_count),
+        'avg_sentence_length': sum(len(s.split()) for s in sentences) / sentence_count if sentences else 0,
+        'contains_table': bool(_TABLE_RE.search(text)),
+        'contains_list': bool(_LIST_RE.search(text)),
+        'contains_code': bool(_CODE_RE.search(text)),
+        'has_references': bool(_REFERENCES_RE.search(text[-100:])),
+        'has_citations': bool(_CITATION_RE.search(text)),
+    }
+
+# Section header patterns used by DocumentChunker._extract_headers
+_HEADER_PATTERNS = [
+    (re.compile(r'^(\d+\.\d+\.\d+\s+.+)$'), 'section'),
+    (re.compile(r'^(\d+\.\d+\s+.+)$'), 'subsection'),
+    (re.compile(r'^([A-Z][A-Z0-9a-z\s]+):$'), 'field')
+]
+
+@lru_cache(maxsize=32)
+def _get_splitter(chunk_size: int, chunk_overlap: int, separators: Tuple[str, ...],
+                  keep_separator: bool, length_function) -> RecursiveCharacterTextSplitter:
+    """
+    Get a text splitter for the given configuration.
+
+    Splitters hold no per-call state, so chunkers sharing a configuration
+    share one instance instead of building a new one per file.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=list(separators),
+        keep_separator=keep_separator,
+        length_function=length_function,
+    )
+
+# Number of leading pages inspected for fonts when deciding whether a PDF
+# is scanned; a text PDF almost always declares a font on its first pages
+SCANNED_CHECK_PAGES = 5
+
+# PDFs with at least this many pages have their text extracted by a pool of
+# worker processes, each parsing its own contiguous range of pages. Opt-in:
+# PDF_EXTRACT_WORKERS sets the size of the single per-process pool, and 0
+# (the default) extracts every PDF in the calling thread
+PARALLEL_EXTRACT_MIN_PAGES = 32
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+
+# Long-lived extraction pool, shared by all threads of the process
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+def _get_extract_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Get or create the process pool used for parallel page extraction.
+
+    Returns None when parallel extraction is disabled or the caller is a
+    daemonic process (e.g. a multiprocessing.Pool worker), which may not
+    start children of its own.
+    """
+    global _extract_pool
+    if PDF_EXTRACT_WORKERS <= 1 or multiprocessing.current_process().daemon:
+        return None
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            # Spawned workers are safe to start from the threaded server process
+            _extract_pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_extract_pool.shutdown)
+        return _extract_pool
+
+def _read_pages(reader: PdfReader, start: int, end: int) -> List[Optional[Tuple[str, bool, bool]]]:
+    """
+    Extract ``(text, has_form, has_images)`` for pages ``start..end-1``;
+    pages that fail to parse yield None.
+    """
+    results = []
+    for page_index in range(start, end):
+        try:
+            page = reader.pages[page_index]
+            page_text = page.extract_text() or ""
+            resources = DocumentChunker._safe_get_resources(page)
+            results.append((page_text, '/Annots' in page, '/XObject' in resources))
+        except Exception as page_error:
+            logger.warning(f"Error processing page {page_index + 1}: {str(page_error)}")
+            results.append(None)
+    return results
+
+def _read_page_range(file_path: str, start: int, end: int) -> List[Optional[Tuple[str, bool, bool]]]:
+    """Process-pool worker: reopen the PDF and extract one range of pages."""
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return _read_pages(PdfReader(mapped), start, end)
+
 class DocumentChunker:
     def __init__(
         self,
@@ -36,20 +165,16 @@ class DocumentChunker:
         self.keep_separator = keep_separator
         self.length_function = length_function
         
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            separators=self.separators,
-            keep_separator=self.keep_separator,
-            length_function=self.length_function,
+        self.text_splitter = _get_splitter(
+            self.chunk_size,
+            self.chunk_overlap,
+            tuple(self.separators),
+            self.keep_separator,
+            self.length_function,
         )
         
         # Initialize metadata extraction patterns
-        self.header_patterns = [
-            (r'^(\d+\.\d+\.\d+\s+.+)$', 'section'),
-            (r'^(\d+\.\d+\s+.+)$', 'subsection'),
-            (r'^([A-Z][A-Z0-9a-z\s]+):$', 'field')
-        ]
+        self.header_patterns = _HEADER_PATTERNS
 
     def chunk_pdf(self, file_path: str) -> List[Dict[str, Any]]:
         """
@@ -62,11 +187,16 @@ class DocumentChunker:
             List of document chunks with rich metadata
         """
         try:
-            # Extract document-level metadata
-            doc_metadata = self._extract_metadata_from_pdf(file_path)
-            
-            # Extract text and page-level metadata
-            text, page_metadata = self._extract_text_from_pdf(file_path)
+            # Parse the PDF once, straight from the page cache through the mmap,
+            # and share the reader between metadata and text extraction
+            with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                reader = PdfReader(mapped)
+                
+                # Extract document-level metadata
+                doc_metadata = self._extract_metadata_from_pdf(file_path, reader)
+                
+                # Extract text and page-level metadata
+                text, page_metadata = self._extract_text_from_pdf(file_path, reader)
             
             # Pre-process text
             text = self._preprocess_text(text)
@@ -74,17 +204,26 @@ class DocumentChunker:
             # Split into chunks
             documents = self.text_splitter.create_documents([text])
             
+            # Find page boundaries in the text; page 1 starts at position 0
+            page_starts = [0]
+            for page in page_metadata.get('pages', []):
+                if 'chunk_start' in page:
+                    page_starts.append(page['chunk_start'])
+            
             # Add metadata to chunks
             chunks = []
+            cursor = 0
             for i, doc in enumerate(documents):
+                chunk_start, cursor = self._locate_chunk(text, doc.page_content, cursor)
+                
                 # Create chunk metadata
                 chunk_meta = doc_metadata.copy()
                 chunk_meta.update({
                     'chunk_id': i,
                     'chunk_size': len(doc.page_content),
                     'total_chunks': len(documents),
-                    'chunk_start': text.find(doc.page_content),
-                    'chunk_end': text.find(doc.page_content) + len(doc.page_content),
+                    'chunk_start': chunk_start,
+                    'chunk_end': chunk_start + len(doc.page_content),
                     'content_type': 'text/plain',
                     'processing_timestamp': datetime.now(timezone.utc).isoformat(),
                 })
@@ -94,21 +233,7 @@ class DocumentChunker:
                 chunk_meta.update(content_analysis)
                 
                 # Determine which page this chunk belongs to
-                current_position = chunk_meta['chunk_start']
-                current_page = 1
-                page_starts = [0]  # Page 1 starts at position 0
-                
-                # Find page boundaries in the text
-                for page in page_metadata.get('pages', []):
-                    if 'chunk_start' in page:
-                        page_starts.append(page['chunk_start'])
-                
-                # Find the current page
-                for j in range(1, len(page_starts)):
-                    if current_position < page_starts[j]:
-                        current_page = j
-                        break
-                
+                current_page = max(1, bisect.bisect_right(page_starts, chunk_start))
                 chunk_meta['page_number'] = current_page
                 
                 # Add page-specific metadata if available
@@ -130,8 +255,22 @@ class DocumentChunker:
             logger.exception("Detailed error:")
             raise
 
-    def _extract_metadata_from_pdf(self, file_path: str) -> Dict[str, Any]:
-        """Extract metadata from a PDF file."""
+    @staticmethod
+    def _locate_chunk(text: str, chunk: str, cursor: int) -> Tuple[int, int]:
+        """
+        Find a chunk's start offset, scanning forward from the previous
+        chunk's start instead of from the beginning of the text.
+        
+        Returns:
+            The chunk start (-1 if not found) and the cursor for the next chunk
+        """
+        start = text.find(chunk, cursor)
+        if start == -1:
+            start = text.find(chunk)
+        return start, (start + 1 if start != -1 else cursor)
+
+    def _extract_metadata_from_pdf(self, file_path: str, reader: PdfReader) -> Dict[str, Any]:
+        """Extract metadata from a PDF file using an already opened reader."""
         metadata = {
             'source': file_path,
             'file_type': 'pdf',
@@ -152,28 +291,27 @@ class DocumentChunker:
         }
         
         try:
-            with open(file_path, 'rb') as file:
-                reader = PdfReader(file)
-                doc_info = reader.metadata
-                
-                metadata.update({
-                    'pages': len(reader.pages),
-                    'title': getattr(doc_info, 'title', None) or os.path.basename(file_path),
-                    'author': getattr(doc_info, 'author', None),
-                    'subject': getattr(doc_info, 'subject', None),
-                    'keywords': getattr(doc_info, 'keywords', '').split(',') if getattr(doc_info, 'keywords', None) else [],
-                    'created_date': str(getattr(doc_info, 'creation_date', None)),
-                    'modified_date': str(getattr(doc_info, 'modification_date', None)),
-                    'has_tables': any('/Table' in page.get('/Type', '') for page in reader.pages if hasattr(page, 'get')),
-                    'is_scanned': self._is_scanned_pdf(reader)
-                })
+            doc_info = reader.metadata
+            
+            metadata.update({
+                'pages': len(reader.pages),
+                'title': getattr(doc_info, 'title', None) or os.path.basename(file_path),
+                'author': getattr(doc_info, 'author', None),
+                'subject': getattr(doc_info, 'subject', None),
+                'keywords': getattr(doc_info, 'keywords', '').split(',') if getattr(doc_info, 'keywords', None) else [],
+                'created_date': str(getattr(doc_info, 'creation_date', None)),
+                'modified_date': str(getattr(doc_info, 'modification_date', None)),
+                'has_tables': any('/Table' in page.get('/Type', '') for page in reader.pages if hasattr(page, 'get')),
+                'is_scanned': self._is_scanned_pdf(reader)
+            })
                 
         except Exception as e:
             logger.warning(f"Could not extract all metadata from {file_path}: {str(e)}")
             
         return metadata
         
-    def _safe_get_resources(self, page) -> dict:
+    @staticmethod
+    def _safe_get_resources(page) -> dict:
         """Safely extract resources from a PDF page, handling IndirectObject."""
         try:
             if hasattr(page, 'get') and callable(page.get):
@@ -185,55 +323,64 @@ class DocumentChunker:
             logger.debug(f"Error getting resources: {str(e)}")
             return {}
 
-    def _extract_text_from_pdf(self, file_path: str) -> Tuple[str, Dict[str, Any]]:
-        """Extract text from a PDF file along with page-level metadata."""
-        full_text = ""
+    def _extract_text_from_pdf(self, file_path: str, reader: PdfReader) -> Tuple[str, Dict[str, Any]]:
+        """Extract text from a PDF file along with page-level metadata, using an already opened reader."""
+        page_texts = []
         page_metadata = []
         
         try:
-            with open(file_path, 'rb') as file:
-                reader = PdfReader(file)
+            num_pages = len(reader.pages)
+            
+            pool = _get_extract_pool() if num_pages >= PARALLEL_EXTRACT_MIN_PAGES else None
+            if pool is not None:
+                page_results = self._read_pages_parallel(pool, file_path, num_pages)
+            else:
+                page_results = _read_pages(reader, 0, num_pages)
+            
+            for page_num, page_result in enumerate(page_results, 1):
+                if page_result is None:
+                    continue
+                page_text, has_form, has_images = page_result
+                page_texts.append(page_text)
                 
-                for page_num, page in enumerate(reader.pages, 1):
-                    try:
-                        page_text = page.extract_text() or ""
-                        full_text += page_text + "\n\n"
-                        
-                        # Get page resources safely
-                        resources = self._safe_get_resources(page)
-                        
-                        # Extract page-level metadata
-                        page_meta = {
-                            'page_number': page_num,
-                            'word_count': len(page_text.split()),
-                            'has_form': '/Annots' in page,
-                            'has_images': '/XObject' in resources,
-                        }
-                        
-                        # Add section headers if found
-                        headers = self._extract_headers(page_text)
-                        if headers:
-                            page_meta['section_headers'] = headers
-                        
-                        page_metadata.append(page_meta)
-                        
-                    except Exception as page_error:
-                        logger.warning(f"Error processing page {page_num}: {str(page_error)}")
-                        continue
+                # Extract page-level metadata
+                page_meta = {
+                    'page_number': page_num,
+                    'word_count': len(page_text.split()),
+                    'has_form': has_form,
+                    'has_images': has_images,
+                }
+                
+                # Add section headers if found
+                headers = self._extract_headers(page_text)
+                if headers:
+                    page_meta['section_headers'] = headers
+                
+                page_metadata.append(page_meta)
                     
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise
             
-        return full_text.strip(), {'pages': page_metadata}
+        return "\n\n".join(page_texts).strip(), {'pages': page_metadata}
+    
+    @staticmethod
+    def _read_pages_parallel(pool: ProcessPoolExecutor, file_path: str,
+                             num_pages: int) -> List[Optional[Tuple[str, bool, bool]]]:
+        """Extract all pages with one contiguous page range per pool worker."""
+        workers = min(PDF_EXTRACT_WORKERS, num_pages)
+        bounds = [num_pages * i // workers for i in range(workers + 1)]
+        ranges = pool.map(_read_page_range, [file_path] * workers, bounds[:-1], bounds[1:])
+        return [page_result for page_range in ranges for page_result in page_range]
 
     def _is_scanned_pdf(self, pdf_reader) -> bool:
         """Check if PDF is scanned (image-based)."""
         try:
-            for page in pdf_reader.pages:
+            pages = pdf_reader.pages[:SCANNED_CHECK_PAGES]
+            for page in pages:
                 if '/Font' in page.get('/Resources', {}):
                     return False
-            return len(pdf_reader.pages) > 0
+            return len(pages) > 0
         except:
             return False
             
@@ -245,7 +392,7 @@ class DocumentChunker:
         for line in lines:
             line = line.strip()
             for pattern, header_type in self.header_patterns:
-                if re.match(pattern, line):
+                if pattern.match(line):
                     headers.append({
                         'text': line,
                         'type': header_type,
@@ -255,22 +402,10 @@ class DocumentChunker:
                     
         return headers
         
-    def _analyze_content(self, text: str) -> Dict[str, Any]:
+    @staticmethod
+    def _analyze_content(text: str) -> Dict[str, Any]:
         """Analyze text content for metadata extraction."""
-        words = text.split()
-        sentences = [s for s in re.split(r'[.!?]+', text) if s.strip()]
-        
-        return {
-            'word_count': len(words),
-            'sentence_count': len(sentences),
-            'avg_word_length': sum(len(word) for word in words) / max(1, len(words)),
-            'avg_sentence_length': sum(len(s.split()) for s in sentences) / max(1, len(sentences)) if sentences else 0,
-            'contains_table': bool(re.search(r'\+[-=]+\+|\|.*\|', text)),
-            'contains_list': bool(re.search(r'^\s*[\d•\-*]+\s+\w', text, re.MULTILINE)),
-            'contains_code': bool(re.search(r'[{};=]|def\s+\w+\(|class\s+\w+', text)),
-            'has_references': bool(re.search(r'references?\s*$', text[-100:], re.IGNORECASE)),
-            'has_citations': bool(re.search(r'\[\d+\]|\([A-Za-z]+,\s*\d{4}\)', text)),
-        }
+        return _analyze_text(text)
 
     def _preprocess_text(self, text: str) -> str:
         """Clean and preprocess the extracted text."""
@@ -278,19 +413,19 @@ class DocumentChunker:
             return ""
             
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _WHITESPACE_RE.sub(' ', text).strip()
         
         # Remove page numbers and headers/footers
-        text = re.sub(r'\n\d+\n', '\n', text)  # Page numbers on their own line
-        text = re.sub(r'\b(?:page|pg\.?|p\.?)\s*\d+\b', '', text, flags=re.IGNORECASE)
+        text = _PAGE_NUMBER_LINE_RE.sub('\n', text)  # Page numbers on their own line
+        text = _PAGE_LABEL_RE.sub('', text)
         
         # Normalize newlines and spaces
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        text = re.sub(r' {2,}', ' ', text)
+        text = _BLANK_LINES_RE.sub('\n\n', text)
+        text = _MULTI_SPACE_RE.sub(' ', text)
         
         # Clean up common PDF artifacts
-        text = re.sub(r'\s*[-•*]\s*', ' ', text)  # Bullet points
-        text = re.sub(r'\f', '\n', text)  # Form feeds
+        text = _BULLET_RE.sub(' ', text)  # Bullet points
+        text = text.replace('\f', '\n')  # Form feeds
         
         return text
 
@@ -329,14 +464,21 @@ class DocumentChunker:
                     'total_sections': len([h for h in headers if h['type'] == 'section'])
                 }
             
+            # Order headers by position once; each chunk then takes the last
+            # header at or before its start via bisect
+            sorted_headers = sorted(headers, key=lambda x: x.get('position', 0))
+            header_positions = [h.get('position', 0) for h in sorted_headers]
+            
             # Split into chunks
             documents = self.text_splitter.create_documents([text])
             
             # Add metadata to chunks
             chunks = []
+            cursor = 0
             for i, doc in enumerate(documents):
                 chunk_meta = base_metadata.copy()
                 chunk_content = doc.page_content
+                chunk_start, cursor = self._locate_chunk(text, chunk_content, cursor)
                 
                 # Add content analysis
                 content_analysis = self._analyze_content(chunk_content)
@@ -346,8 +488,8 @@ class DocumentChunker:
                     'chunk_id': i,
                     'chunk_size': len(chunk_content),
                     'total_chunks': len(documents),
-                    'chunk_start': text.find(chunk_content),
-                    'chunk_end': text.find(chunk_content) + len(chunk_content),
+                    'chunk_start': chunk_start,
+                    'chunk_end': chunk_start + len(chunk_content),
                     'content_type': 'text/plain',
                     'processing_timestamp': datetime.datetime.utcnow().isoformat(),
                 })
@@ -357,14 +499,10 @@ class DocumentChunker:
                 
                 # Determine which section this chunk belongs to
                 if headers:
-                    chunk_position = chunk_meta['chunk_start']
-                    current_section = None
-                    
-                    for header in sorted(headers, key=lambda x: x.get('position', 0)):
-                        if header.get('position', 0) <= chunk_position:
-                            current_section = header
+                    header_index = bisect.bisect_right(header_positions, chunk_start) - 1
                     
-                    if current_section:
+                    if header_index >= 0:
+                        current_section = sorted_headers[header_index]
                         chunk_meta['section'] = {
                             'title': current_section['text'],
                             'type': current_section['type'],
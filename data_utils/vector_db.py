@@ -1,9 +1,19 @@
 from pinecone import Pinecone, ServerlessSpec
-from dotenv import load_dotenv
+from pinecone.exceptions import PineconeApiException
+from utils.env import load_env
 import os
+import threading
+
+# The gRPC client (pip install "pinecone[grpc]") upserts noticeably faster
+# than REST; fall back to REST when it isn't installed
+try:
+    from pinecone.grpc import PineconeGRPC
+    GRPC_AVAILABLE = True
+except ImportError:
+    GRPC_AVAILABLE = False
 
 # Load environment variables
-load_dotenv()
+load_env()
 pinecone_api_key = os.getenv("PINECONE_API_KEY")
 pc = Pinecone(api_key=pinecone_api_key)
 
@@ -12,35 +22,66 @@ DOCTOR_INDEX = "doctorfinalindex"
 PATIENT_INDEX = "patientindex"
 EMBEDDING_DIMENSION = 1536  # Default dimension for OpenAI embeddings
 
-def init_doctor_db() -> None:
+# Index handles are created once per (name, pool_threads) and reused, so
+# repeated init_*_db() calls skip the control-plane lookups. Handles (and
+# the client) inherited across a fork are dropped, since their connection
+# and thread pools belong to the parent
+_indexes = {}
+_indexes_pid = os.getpid()
+_indexes_lock = threading.Lock()
+
+def _get_index(name: str, region: str, pool_threads: int = 1):
+    """Create the index if it doesn't exist and return a cached handle to it."""
+    global pc, _indexes_pid
+    key = (name, pool_threads)
+    with _indexes_lock:
+        if _indexes_pid != os.getpid():
+            pc = Pinecone(api_key=pinecone_api_key)
+            _indexes.clear()
+            _indexes_pid = os.getpid()
+        if key not in _indexes:
+            if name not in pc.list_indexes().names():
+                try:
+                    pc.create_index(
+                        name=name,
+                        dimension=EMBEDDING_DIMENSION,
+                        metric="cosine",
+                        spec=ServerlessSpec(
+                            cloud='aws',
+                            region=region
+                        )
+                    )
+                except PineconeApiException as e:
+                    # Another process created it in the meantime
+                    if e.status != 409:
+                        raise
+            _indexes[key] = pc.Index(name, pool_threads=pool_threads)
+        return _indexes[key]
+
+def init_doctor_db(pool_threads: int = 1) -> None:
     """
     Initialize the doctor vector database index if it doesn't exist.
+    
+    Args:
+        pool_threads: Size of the thread pool used for ``async_req`` upserts
+    """
+    return _get_index(DOCTOR_INDEX, 'us-east-1', pool_threads)
+
+def init_doctor_grpc_index():
+    """
+    Get a gRPC handle to the doctor index for bulk upserts.
+    
+    Returns:
+        The gRPC index, or None if the pinecone gRPC extras are not installed.
+        The index itself must already exist (see ``init_doctor_db``).
     """
-    if DOCTOR_INDEX not in pc.list_indexes().names():
-        pc.create_index(
-            name=DOCTOR_INDEX,
-            dimension=EMBEDDING_DIMENSION,
-            metric="cosine",
-            spec=ServerlessSpec(
-                cloud='aws',
-                region='us-east-1'
-            )
-        )
-    return pc.Index(DOCTOR_INDEX)
+    if not GRPC_AVAILABLE:
+        return None
+    return PineconeGRPC(api_key=pinecone_api_key).Index(DOCTOR_INDEX)
 
 def init_patient_db() -> None:
     """
     Initialize the patient vector database index if it doesn't exist.
     """
-    if PATIENT_INDEX not in pc.list_indexes().names():
-        pc.create_index(
-            name=PATIENT_INDEX,
-            dimension=EMBEDDING_DIMENSION,
-            metric="cosine",
-            spec=ServerlessSpec(
-                cloud='aws',
-                region='us-west-2'
-            )
-        )
-    return pc.Index(PATIENT_INDEX)
+    return _get_index(PATIENT_INDEX, 'us-west-2')
 
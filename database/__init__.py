@@ -1,7 +1,8 @@
 # Import all models to ensure they are registered with SQLAlchemy
-from .models import Base, User, ChatSession
-from .article import Article
+from .database import Base
+from .models import User, ChatSession, ChatMessage
+from .article import Article, ArticleStatus
 
 # This ensures that all models are imported and registered with SQLAlchemy
 # before any relationships are configured
-__all__ = ['Base', 'User', 'ChatSession', 'Article']
+__all__ = ['Base', 'User', 'ChatSession', 'ChatMessage', 'Article', 'ArticleStatus']
@@ -1,18 +1,46 @@
-from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, ForeignKey ,DateTime
-from sqlalchemy.orm import relationship
+from enum import IntEnum
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, ForeignKey ,DateTime, Index, func
+from sqlalchemy.orm import relationship, validates
 from database.database import Base
 
+class ArticleStatus(IntEnum):
+    """Article status, stored as a small integer."""
+    DRAFT = 0
+    PUBLISHED = 1
+    ARCHIVED = 2
+
+    @classmethod
+    def coerce(cls, value) -> int:
+        """Return the stored value of a status, given a member, value or name such as 'draft'."""
+        if isinstance(value, str):
+            return cls[value.upper()].value
+        return cls(value).value
+
 class Article(Base):
     __tablename__ = 'articles'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
-    author_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    status = Column(String, default='draft', nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    author_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    status = Column(SmallInteger, default=ArticleStatus.DRAFT.value, nullable=False, index=True)
+    # Stamped by the database, so bulk inserts send no per-row timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # Use string-based relationship to avoid circular imports
-    author = relationship("User", back_populates="articles", lazy="joined")
+    # Not loaded implicitly; use selectinload(Article.author) when needed
+    author = relationship("User", back_populates="articles", lazy="raise")
+
+    def __repr__(self):
+        return f"<Article id={self.id} author_id={self.author_id} status={self.status}>"
+
+    @validates('status')
+    def _validate_status(self, key, value):
+        """Accept status names such as 'draft' for backward compatibility."""
+        return ArticleStatus.coerce(value)
+
+    __table_args__ = (
+        # Serves "an author's most recent articles with a given status"
+        Index('ix_articles_author_status_created', 'author_id', 'status', created_at.desc()),
+    )
@@ -0,0 +1,98 @@
+from typing import List, Dict, Any, Optional
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session, selectinload, raiseload
+from database.models import User, ResearchPaper, ResearchPaperScore, ResearchPaperKeyword, ResearchPaperComment
+from database.article import Article, ArticleStatus
+
+def get_user(session: Session, user_id: int) -> Optional[User]:
+    """
+    Get a user by primary key.
+
+    Session.get checks the session's identity map first, so repeated lookups
+    within one request (e.g. auth checks) reuse the loaded row instead of
+    querying again. Routes should share the request's get_db session.
+
+    Args:
+        session: Active SQLAlchemy session
+        user_id: ID of the user
+
+    Returns:
+        The User, or None if it does not exist
+    """
+    return session.get(User, user_id)
+
+def list_papers(session: Session) -> List[ResearchPaper]:
+    """
+    List research papers with their scores, keywords and comments.
+
+    The child collections are loaded with one batched SELECT each; any other
+    relationship access raises instead of silently emitting per-row queries.
+
+    Args:
+        session: Active SQLAlchemy session
+
+    Returns:
+        List of ResearchPaper objects
+    """
+    stmt = select(ResearchPaper).options(
+        selectinload(ResearchPaper.scores),
+        selectinload(ResearchPaper.keywords),
+        selectinload(ResearchPaper.comments),
+        raiseload("*"),
+    )
+    return session.scalars(stmt).all()
+
+def save_paper(session: Session, paper: Dict[str, Any], scores: List[Dict[str, Any]],
+               keywords: List[Dict[str, Any]], comments: List[Dict[str, Any]]) -> int:
+    """
+    Save a research paper and its child rows in a single transaction.
+
+    The paper is added through the ORM to obtain its primary key; the child
+    rows are inserted with one executemany statement per table, without
+    instantiating ORM objects.
+
+    Args:
+        session: Active SQLAlchemy session
+        paper: ResearchPaper column values
+        scores: ResearchPaperScore rows, without research_paper_id
+        keywords: ResearchPaperKeyword rows, without research_paper_id
+        comments: ResearchPaperComment rows, without research_paper_id
+
+    Returns:
+        The ID of the created ResearchPaper record
+    """
+    research_paper = ResearchPaper(**paper)
+    session.add(research_paper)
+    session.flush()  # Flush to get the ID for the child rows
+    
+    paper_id = research_paper.id
+    for model, rows in ((ResearchPaperScore, scores),
+                        (ResearchPaperKeyword, keywords),
+                        (ResearchPaperComment, comments)):
+        if rows:
+            session.execute(insert(model.__table__), [{**row, 'research_paper_id': paper_id} for row in rows])
+    
+    session.commit()
+    return paper_id
+
+def bulk_create_articles(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert many articles in a single executemany round trip.
+
+    The Core insert bypasses Article's status validator, so each status is
+    coerced through ArticleStatus here; an unknown status raises before
+    anything is sent. The caller commits.
+
+    Args:
+        session: Active SQLAlchemy session
+        rows: Article column values with title, content, author_id and
+            optionally a status (ArticleStatus member, value or name)
+
+    Raises:
+        ValueError: If a status is not a valid ArticleStatus value
+        KeyError: If a status is not a valid ArticleStatus name
+    """
+    if not rows:
+        return
+    rows = [{**row, 'status': ArticleStatus.coerce(row['status'])} if 'status' in row else row for row in rows]
+    session.execute(insert(Article), rows)
@@ -9,10 +9,12 @@ DATABASE_URL = settings.DATABASE_URL
 # Create database engine with connection pooling
 engine = create_engine(
     DATABASE_URL,
-    pool_size=22,  # Maintain 5 persistent connections
-    max_overflow=10,  # Allow up to 10 overflow connections
-    pool_timeout=60,  # 30 seconds timeout
+    pool_size=settings.DB_POOL_SIZE,  # Persistent connections per worker process
+    max_overflow=settings.DB_MAX_OVERFLOW,  # Extra connections allowed under load
+    pool_timeout=60,  # 60 seconds timeout
     pool_recycle=1800,  # Recycle connections after 30 minutes
+    pool_pre_ping=True,  # Replace connections dropped by the server before use
+    query_cache_size=1200,  # Compiled statement cache entries (default 500)
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,5 +1,6 @@
 from sqlalchemy import create_engine
-from models import Base
+from database.database import Base
+import database  # noqa: F401  Registers every model on Base
 import os
 from dotenv import load_dotenv
 
@@ -1,15 +1,12 @@
-from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Enum, Text, ForeignKey, JSON, Integer, Boolean
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, String, DateTime, Enum, Text, ForeignKey, Integer, Boolean, func
 from sqlalchemy.orm import relationship
-
-Base = declarative_base()
+from database.database import Base
 
 class User(Base):
     __tablename__ = 'users'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    email = Column(String, unique=True, nullable=False)
+    email = Column(String, unique=True, nullable=False, index=True)
     role = Column(Enum('patient', 'doctor', 'admin', name='user_roles'), nullable=False)
     name = Column(String, nullable=False)
     surname = Column(String, nullable=False)
@@ -17,38 +14,39 @@ class User(Base):
     specialization = Column(String, nullable=True)
     doctor_register_number = Column(String, nullable=True)
     hashed_password = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # Use string-based relationships to avoid circular imports
     articles = relationship("Article", back_populates="author", lazy="dynamic")
     chat_sessions = relationship("ChatSession", back_populates="user")
 
-class Article(Base):
-    __tablename__ = 'articles'
+class ChatSession(Base):
+    __tablename__ = 'chat_sessions'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
-    author_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    status = Column(String, default='draft', nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # Relationships
-    author = relationship("User", back_populates="articles")
+    user = relationship("User", back_populates="chat_sessions")
+    messages = relationship("ChatMessage", back_populates="session", order_by="ChatMessage.timestamp",
+                            cascade="all, delete-orphan", lazy="selectin")
 
-class ChatSession(Base):
-    __tablename__ = 'chat_sessions'
 
+class ChatMessage(Base):
+    __tablename__ = 'chat_messages'
+
+    # One row per message, so appending to a session is a single INSERT
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    messages = Column(JSON, default=list)  # Stores array of {content: string, sender: string, timestamp: datetime}
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    session_id = Column(Integer, ForeignKey('chat_sessions.id'), nullable=False, index=True)
+    content = Column(Text, nullable=False)
+    sender = Column(String, nullable=False)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # Relationships
-    user = relationship("User", back_populates="chat_sessions")
+    session = relationship("ChatSession", back_populates="messages")
 
 
 class ResearchPaper(Base):
@@ -59,20 +57,21 @@ class ResearchPaper(Base):
     total_score = Column(Integer, nullable=False)
     confidence = Column(Integer, nullable=False)  # Stored as integer (0-100)
     paper_type = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
-    # Relationships
-    scores = relationship("ResearchPaperScore", back_populates="research_paper", cascade="all, delete-orphan")
-    keywords = relationship("ResearchPaperKeyword", back_populates="research_paper", cascade="all, delete-orphan")
-    comments = relationship("ResearchPaperComment", back_populates="research_paper", cascade="all, delete-orphan")
+    # Relationships; each collection loads for all fetched papers in one
+    # extra SELECT ... WHERE research_paper_id IN (...)
+    scores = relationship("ResearchPaperScore", back_populates="research_paper", cascade="all, delete-orphan", lazy="selectin")
+    keywords = relationship("ResearchPaperKeyword", back_populates="research_paper", cascade="all, delete-orphan", lazy="selectin")
+    comments = relationship("ResearchPaperComment", back_populates="research_paper", cascade="all, delete-orphan", lazy="selectin")
 
 
 class ResearchPaperScore(Base):
     __tablename__ = 'research_paper_scores'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    research_paper_id = Column(Integer, ForeignKey('research_papers.id'), nullable=False)
+    research_paper_id = Column(Integer, ForeignKey('research_papers.id'), nullable=False, index=True)
     category = Column(String, nullable=False)  # e.g., 'Study Design', 'Sample Size Power'
     score = Column(Integer, nullable=False)
     rationale = Column(Text, nullable=False)
@@ -86,7 +85,7 @@ class ResearchPaperKeyword(Base):
     __tablename__ = 'research_paper_keywords'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    research_paper_id = Column(Integer, ForeignKey('research_papers.id'), nullable=False)
+    research_paper_id = Column(Integer, ForeignKey('research_papers.id'), nullable=False, index=True)
     keyword = Column(String, nullable=False)
     
     # Relationships
@@ -97,7 +96,7 @@ class ResearchPaperComment(Base):
     __tablename__ = 'research_paper_comments'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    research_paper_id = Column(Integer, ForeignKey('research_papers.id'), nullable=False)
+    research_paper_id = Column(Integer, ForeignKey('research_papers.id'), nullable=False, index=True)
     comment = Column(Text, nullable=False)
     is_penalty = Column(Boolean, default=False, nullable=False)
     
@@ -1,12 +1,18 @@
 import multiprocessing
 import os
+import sys
 
 # Server Socket
 bind = f"0.0.0.0:{os.environ.get('PORT')}"
 backlog = 2048  
 # Worker Processes
-workers = (multiprocessing.cpu_count() * 2) + 1 
+# Capped so workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays within the
+# database's max_connections
+MAX_WORKERS = 16
+workers = int(os.environ.get("GUNICORN_WORKERS") or min((multiprocessing.cpu_count() * 2) + 1, MAX_WORKERS))
 worker_class = 'uvicorn.workers.UvicornWorker'  
+# Import the app once in the master so workers share its pages copy-on-write
+preload_app = True
 worker_connections = 1000
 max_requests = 1000  
 max_requests_jitter = 50  
@@ -27,7 +33,9 @@ group = None  # Drop privileges to this group if running as root
 tmp_upload_dir = None  # Directory to store temporary uploads
 
 # # Logging
-# accesslog = 'logs/gunicorn_access.log'  
+# Per-request access lines are written synchronously by every worker, so
+# they stay off unless DISABLE_ACCESS_LOG=false
+accesslog = None if os.environ.get("DISABLE_ACCESS_LOG", "true").lower() == "true" else 'logs/gunicorn_access.log'
 # errorlog = 'logs/gunicorn_error.log'  
 # loglevel = 'info'  
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(L)s'  
@@ -37,6 +45,24 @@ proc_name = 'metamed_backend'
 
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+    # With preload_app the engine was created in the master; drop any pooled
+    # connections inherited from it without closing the master's sockets
+    try:
+        from database.database import engine
+        engine.dispose(close=False)
+    except ImportError:
+        pass
+    # The RAG ingestion clients (including the PineconeGRPC channel, which
+    # is not fork-safe) were also created in the master at import; give the
+    # worker its own. _init_worker only re-creates them in a new process
+    ingestion = sys.modules.get("Rag_Service.ingestion")
+    if ingestion is not None:
+        ingestion._init_worker()
+    # The JSON logging listener thread started in the master didn't survive
+    # the fork; start the worker's own
+    app_logging = sys.modules.get("utils.logger")
+    if app_logging is not None:
+        app_logging.setup_logging()
 
 def pre_fork(server, worker):
     pass
@@ -1,11 +1,10 @@
-import os
+import database  # noqa: F401  Registers every model on Base
 from database.database import engine, Base
-from database.models import Base as ModelsBase
 
 def init_db():
     print("Creating database tables...")
     # Create all tables
-    ModelsBase.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
     print("Database tables created successfully!")
 
 if __name__ == "__main__":
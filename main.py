@@ -1,32 +1,30 @@
 import os
-import uvicorn
 from fastapi import FastAPI, UploadFile, File, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List
 import logging
 from pathlib import Path
 import tempfile
-import shutil
-import json
 import asyncio
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import anyio
 
 # Import the rater module
-from Score_Rater.rater import process_paper, clara_prompt
+from Score_Rater.rater import process_paper_stream, MAX_CONCURRENT_PAPERS
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="MetaMed Research Paper Rater",
     description="Web interface for evaluating research papers using the CLARA-2 scoring framework",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Set up templates
@@ -35,15 +33,35 @@ templates = Jinja2Templates(directory="templates")
 # Mount static files
 app.mount("/static", StaticFiles(directory="templates/static"), name="static")
 
-# CORS middleware configuration
+# CORS middleware configuration; CORS_ORIGINS is a comma-separated list of
+# allowed origins. Without it any origin is allowed, but without credentials,
+# since browsers reject a wildcard origin on credentialed requests
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
+    allow_origins=CORS_ORIGINS or ["*"],
+    allow_credentials=bool(CORS_ORIGINS),
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Maximum number of uploaded files processed concurrently per request,
+# to avoid overwhelming the OpenAI API and system resources
+MAX_CONCURRENT_FILES = 5
+
+# Cap on papers processed at once across all requests served by this worker
+# (MAX_CONCURRENT_PAPERS, shared with the rater's pools). Each paper holds a
+# thread mostly idle on OpenAI round trips, so the cap sits well above the
+# CPU count; the rater separately bounds in-flight OpenAI calls
+_paper_limiter = None
+
+def get_paper_limiter() -> anyio.CapacityLimiter:
+    """Get or create the worker-wide paper limiter; created inside the event loop."""
+    global _paper_limiter
+    if _paper_limiter is None:
+        _paper_limiter = anyio.CapacityLimiter(MAX_CONCURRENT_PAPERS)
+    return _paper_limiter
+
 # Pydantic models for request/response
 class RatingResponse(BaseModel):
     success: bool
@@ -53,58 +71,30 @@ class RatingResponse(BaseModel):
     processed_files: Optional[List[str]] = None
 
 # Helper functions
-def save_upload_file(upload_file: UploadFile, destination: Path) -> str:
-    """Save an uploaded file to the specified destination."""
-    try:
-        with destination.open("wb") as buffer:
-            shutil.copyfileobj(upload_file.file, buffer)
-        return str(destination)
-    finally:
-        upload_file.file.close()
-
-def process_uploaded_item(item_path: Path, skip_rag: bool, skip_db: bool) -> Dict[str, Any]:
-    """Process a single file or directory."""
+def process_uploaded_pdf(file_obj, target_file: Path, skip_rag: bool, skip_db: bool) -> Dict[str, Any]:
+    """Write and process a single uploaded PDF; the rater removes the file afterwards."""
     results = {
         "successful": [],
         "failed": []
     }
     
-    if item_path.is_file() and item_path.suffix.lower() == '.pdf':
-        try:
-            result = process_paper(
-                file_path=str(item_path),
-                skip_rag=skip_rag,
-                skip_db=skip_db
-            )
-            results["successful"].append({
-                "file_path": str(item_path),
-                "result": result
-            })
-        except Exception as e:
-            logger.error(f"Error processing {item_path}: {str(e)}", exc_info=True)
-            results["failed"].append({
-                "file_path": str(item_path),
-                "error": str(e)
-            })
-    elif item_path.is_dir():
-        # Recursively process all PDFs in the directory
-        for file_path in item_path.rglob('*.pdf'):
-            try:
-                result = process_paper(
-                    file_path=str(file_path),
-                    skip_rag=skip_rag,
-                    skip_db=skip_db
-                )
-                results["successful"].append({
-                    "file_path": str(file_path),
-                    "result": result
-                })
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {str(e)}", exc_info=True)
-                results["failed"].append({
-                    "file_path": str(file_path),
-                    "error": str(e)
-                })
+    try:
+        result = process_paper_stream(
+            file_obj,
+            file_path=str(target_file),
+            skip_rag=skip_rag,
+            skip_db=skip_db
+        )
+        results["successful"].append({
+            "file_path": str(target_file),
+            "result": result
+        })
+    except Exception as e:
+        logger.error(f"Error processing {target_file}: {str(e)}", exc_info=True)
+        results["failed"].append({
+            "file_path": str(target_file),
+            "error": str(e)
+        })
     
     return results
 
@@ -115,36 +105,23 @@ def process_single_file(file_data: tuple) -> Dict[str, Any]:
     try:
         # Handle potential folder structure in filename
         file_path = Path(file.filename)
+        has_subdir = len(file_path.parts) > 1
         
         # Create necessary subdirectories in temp folder
         target_dir = temp_dir
-        if len(file_path.parts) > 1:
+        if has_subdir:
             # Create all parent directories
             target_dir = temp_dir / file_path.parent
             target_dir.mkdir(parents=True, exist_ok=True)
         
-        # Save the uploaded file to a temporary location with proper path handling
+        # Stream the upload to a temporary location with proper path handling;
+        # it is hashed as it is written and removed once processed
         target_file = target_dir / file_path.name
-        with target_file.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Process the file or directory
-        process_results = process_uploaded_item(target_file, skip_rag, skip_db)
-        
-        # Clean up the temporary file
-        if target_file.exists():
-            if target_file.is_file():
-                target_file.unlink()
-            else:
-                shutil.rmtree(target_file)
+        if target_file.suffix.lower() == '.pdf':
+            process_results = process_uploaded_pdf(file.file, target_file, skip_rag, skip_db)
+        else:
+            process_results = {"successful": [], "failed": []}
                 
-        # Clean up empty directories
-        if len(file_path.parts) > 1:
-            try:
-                target_dir.rmdir()  # Remove if empty
-            except OSError:
-                pass  # Directory not empty, leave it
-        
         return {
             "filename": file.filename,
             "results": process_results
@@ -184,75 +161,77 @@ async def rate_uploaded_paper(
             detail="No files provided"
         )
     
-    temp_dir = Path("temp_uploads")
-    temp_dir.mkdir(exist_ok=True)
-    
-    results = {
-        "successful": [],
-        "failed": []
-    }
+    # Per-request scratch directory, removed together with anything left in
+    # it when the request finishes
+    with tempfile.TemporaryDirectory(prefix="metamed_") as scratch_dir:
+        temp_dir = Path(scratch_dir)
+        
+        results = {
+            "successful": [],
+            "failed": []
+        }
     
-    try:
-        # Determine optimal number of concurrent workers
-        # Limit to avoid overwhelming OpenAI API and system resources
-        max_workers = min(len(files), 5)  # Process max 5 files concurrently
+        try:
+            # Determine optimal number of concurrent workers
+            max_workers = min(len(files), MAX_CONCURRENT_FILES)
+            limiter = anyio.CapacityLimiter(max_workers)
         
-        logger.info(f"Processing {len(files)} files with {max_workers} concurrent workers")
+            logger.info(f"Processing {len(files)} files with {max_workers} concurrent workers")
         
-        # Prepare file data for concurrent processing
-        file_data_list = [(file, temp_dir, skip_rag, skip_db) for file in files]
+            # Prepare file data for concurrent processing
+            file_data_list = [(file, temp_dir, skip_rag, skip_db) for file in files]
         
-        # Process files concurrently using ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
-            future_to_file = {
-                executor.submit(process_single_file, file_data): file_data[0] 
-                for file_data in file_data_list
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_file):
-                original_file = future_to_file[future]
-                try:
-                    result = future.result()
-                    
-                    if "error" in result:
-                        results["failed"].append({
-                            "file": result["filename"],
-                            "error": result["error"]
-                        })
-                    else:
-                        file_results = result["results"]
-                        results["successful"].extend(file_results["successful"])
-                        results["failed"].extend(file_results["failed"])
-                        
-                except Exception as e:
-                    logger.error(f"Unexpected error processing {original_file.filename}: {str(e)}", exc_info=True)
+            # Each file is processed in a worker thread so the event loop keeps
+            # serving other requests while papers are rated; threads come from the
+            # worker-wide limiter instead of anyio's default 40-thread pool limit
+            async def run(file_data: tuple) -> Dict[str, Any]:
+                async with limiter:
+                    return await anyio.to_thread.run_sync(process_single_file, file_data,
+                                                          limiter=get_paper_limiter())
+        
+            results_list = await asyncio.gather(*[run(fd) for fd in file_data_list], return_exceptions=True)
+        
+            # Collect results
+            for file_data, result in zip(file_data_list, results_list):
+                original_file = file_data[0]
+                if isinstance(result, Exception):
+                    logger.error(f"Unexpected error processing {original_file.filename}: {str(result)}", exc_info=result)
                     results["failed"].append({
                         "file": original_file.filename,
-                        "error": str(e)
+                        "error": str(result)
                     })
+                elif "error" in result:
+                    results["failed"].append({
+                        "file": result["filename"],
+                        "error": result["error"]
+                    })
+                else:
+                    file_results = result["results"]
+                    results["successful"].extend(file_results["successful"])
+                    results["failed"].extend(file_results["failed"])
         
-        # Prepare response
-        response_data = RatingResponse(
-            success=bool(results["successful"]),
-            message=f"Processed {len(results['successful'])} file(s) successfully" + 
-                   (f", {len(results['failed'])} failed" if results['failed'] else ""),
-            data={"results": results},
-            processed_files=[f["file_path"] for f in results["successful"]]
-        )
+            # Prepare response
+            response_data = RatingResponse(
+                success=bool(results["successful"]),
+                message=f"Processed {len(results['successful'])} file(s) successfully" + 
+                       (f", {len(results['failed'])} failed" if results['failed'] else ""),
+                data={"results": results},
+                processed_files=[f["file_path"] for f in results["successful"]]
+            )
         
-        # If no files were processed successfully, return an error
-        if not results["successful"] and results["failed"]: 
-            response_data.success = False
-            response_data.error = "Failed to process all files"
+            # If no files were processed successfully, return an error
+            if not results["successful"] and results["failed"]: 
+                response_data.success = False
+                response_data.error = "Failed to process all files"
             
-        return response_data
+            # Returned as a ready response: the nested results are serialized once
+            # by orjson instead of being re-validated against RatingResponse
+            return ORJSONResponse(response_data.model_dump(exclude_none=True))
         
-    except Exception as e:
-        logger.error(f"Error processing uploaded files: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing files: {str(e)}"
-        )
+        except Exception as e:
+            logger.error(f"Error processing uploaded files: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error processing files: {str(e)}"
+            )
 
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from utils.file_cache import FCNTL_AVAILABLE, FileCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FileCache(cache_dir=str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def paper(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"%PDF-1.4 test paper")
+    return str(path)
+
+
+RESULT = {"scores": [{"category": "Design", "score": 4}], "metadata": {"total_score": 4}}
+
+
+def test_set_then_get_round_trips(cache, paper):
+    assert cache.get(paper) is None
+    assert cache.set(paper, RESULT)
+    assert cache.get(paper) == RESULT
+
+
+def test_get_reads_the_index_when_memory_is_cold(cache, paper, tmp_path):
+    cache.set(paper, RESULT)
+    reopened = FileCache(cache_dir=str(tmp_path / "cache"))
+    assert reopened.get(paper) == RESULT
+
+
+def test_get_returns_a_copy(cache, paper):
+    cache.set(paper, RESULT)
+    cache.get(paper)["metadata"] = None
+    assert cache.get(paper) == RESULT
+
+
+def test_digest_keys_entries_on_content(cache, paper):
+    digest = FileCache.file_digest(paper)
+    cache.set(paper, RESULT, digest=digest)
+    # Touching the file changes its stat fingerprint but not its content
+    os.utime(paper, ns=(0, 0))
+    assert cache.get(paper) is None
+    assert cache.get(paper, digest=FileCache.file_digest(paper)) == RESULT
+
+
+def test_expired_entries_are_not_returned(cache, paper):
+    cache.set(paper, RESULT)
+    cache.ttl_seconds = 0
+    assert cache.get(paper) is None
+    assert cache.cleanup_expired() == 1
+
+
+def test_invalidate_removes_the_entry(cache, paper):
+    cache.set(paper, RESULT)
+    assert cache.invalidate(paper)
+    assert cache.get(paper) is None
+    assert not cache.invalidate(paper)
+
+
+@pytest.mark.skipif(not FCNTL_AVAILABLE, reason="entry locks need fcntl")
+def test_entry_lock_is_exclusive_and_released(cache, paper, monkeypatch):
+    monkeypatch.setattr("utils.file_cache.LOCK_WAIT_SECONDS", 0)
+    with cache.entry_lock(paper) as held:
+        assert held
+        # A second holder times out while the first one keeps the lock
+        with cache.entry_lock(paper) as other:
+            assert not other
+    with cache.entry_lock(paper) as held:
+        assert held
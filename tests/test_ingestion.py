@@ -0,0 +1,63 @@
+from unittest import mock
+
+import pytest
+
+from utils.file_cache import FileCache
+
+CHUNKS = [{"text": "introduction"}, {"text": "methods"}, {"text": "results"}]
+
+
+@pytest.fixture
+def index(ingestion, pinecone_index, monkeypatch):
+    pinecone_index.reset_mock(return_value=True, side_effect=True)
+    embeddings = mock.Mock()
+    embeddings.embed_documents.side_effect = lambda texts: [[float(i)] * 4 for i in range(len(texts))]
+    monkeypatch.setattr(ingestion, "embeddings", embeddings)
+    return pinecone_index
+
+
+def _upserted_ids(index):
+    return [
+        vector_id
+        for call in index.upsert.call_args_list
+        for vector_id, _, _ in call.kwargs["vectors"]
+    ]
+
+
+def test_vector_ids_are_doc_id_and_chunk_number(ingestion, index):
+    index.list.return_value = iter([])
+    assert ingestion.ingestion_docs_doctor("paper.pdf", chunks=CHUNKS, doc_id="abc")
+    assert _upserted_ids(index) == ["abc#0", "abc#1", "abc#2"]
+    _, _, metadata = index.upsert.call_args.kwargs["vectors"][-1]
+    assert metadata["text"] == "results"
+    assert metadata["is_rated"] is False
+
+
+def test_doc_id_defaults_to_the_content_digest(ingestion, index, tmp_path):
+    paper = tmp_path / "paper.pdf"
+    paper.write_bytes(b"%PDF-1.4 test paper")
+    index.list.return_value = iter([])
+    assert ingestion.ingestion_docs_doctor(str(paper), chunks=CHUNKS)
+    digest = FileCache.file_digest(str(paper))
+    assert _upserted_ids(index) == [f"{digest}#{i}" for i in range(len(CHUNKS))]
+
+
+def test_stale_vectors_of_a_longer_ingest_are_deleted(ingestion, index):
+    # An earlier ingest of the same document produced five chunks
+    index.list.return_value = iter([["abc#0", "abc#1", "abc#2"], ["abc#3", "abc#4"]])
+    assert ingestion.ingestion_docs_doctor("paper.pdf", chunks=CHUNKS, doc_id="abc")
+    assert index.list.call_args.kwargs["prefix"] == "abc#"
+    deleted = [vector_id for call in index.delete.call_args_list for vector_id in call.kwargs["ids"]]
+    assert deleted == ["abc#3", "abc#4"]
+
+
+def test_nothing_is_deleted_when_no_vectors_are_stale(ingestion, index):
+    index.list.return_value = iter([["abc#0", "abc#1", "abc#2"]])
+    assert ingestion.ingestion_docs_doctor("paper.pdf", chunks=CHUNKS, doc_id="abc")
+    index.delete.assert_not_called()
+
+
+def test_empty_documents_write_nothing(ingestion, index):
+    assert ingestion.ingestion_docs_doctor("paper.pdf", chunks=[], doc_id="abc")
+    index.upsert.assert_not_called()
+    index.delete.assert_not_called()
@@ -0,0 +1,41 @@
+import logging
+import queue
+
+import orjson
+
+from utils.logger import OrjsonFormatter, _RecordQueueHandler
+
+
+def _log_through_queue(log):
+    """Log via a _RecordQueueHandler and return the queued record as parsed JSON."""
+    log_queue = queue.Queue()
+    logger = logging.getLogger("tests.logger")
+    logger.propagate = False
+    handler = _RecordQueueHandler(log_queue)
+    logger.addHandler(handler)
+    try:
+        log(logger)
+    finally:
+        logger.removeHandler(handler)
+    return orjson.loads(OrjsonFormatter().format(log_queue.get_nowait()))
+
+
+def test_exception_keeps_separate_exc_info_field():
+    def log(logger):
+        try:
+            raise ValueError("bad value")
+        except ValueError:
+            logger.exception("boom %s", 1)
+
+    record = _log_through_queue(log)
+    assert record["message"] == "boom 1"
+    assert "Traceback" in record["exc_info"]
+    assert "ValueError: bad value" in record["exc_info"]
+
+
+def test_stack_info_and_extra_fields():
+    record = _log_through_queue(lambda logger: logger.warning("hi", stack_info=True, extra={"paper": "a.pdf"}))
+    assert record["message"] == "hi"
+    assert record["paper"] == "a.pdf"
+    assert "stack_info" in record
+    assert "exc_info" not in record
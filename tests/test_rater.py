@@ -0,0 +1,89 @@
+from unittest import mock
+
+import httpx
+import openai
+import orjson
+import pytest
+
+CLARA_OUTPUT = {
+    "scores": {
+        "study_design": {"score": 4, "rationale": "Randomized"},
+        "sample_size": {"score": 2},
+    },
+    "total_score": 6,
+    "confidence": 0.8,
+    "comments": ["Small cohort"],
+    "Keywords": ["trial"],
+    "paper_type": "RCT",
+    "penalties": ["Penalty: no blinding"],
+}
+
+
+def test_process_rater_output_structures_scores_and_metadata(rater):
+    processed = rater.process_rater_output(orjson.dumps(CLARA_OUTPUT).decode())
+    assert processed["scores"] == [
+        {"category": "Study Design", "score": 4, "rationale": "Randomized"},
+        {"category": "Sample Size", "score": 2, "rationale": "No rationale provided"},
+    ]
+    assert processed["metadata"] == {
+        "total_score": 6,
+        "confidence": 0.8,
+        "comments": ["Small cohort"],
+        "Keywords": ["trial"],
+        "paper_type": "RCT",
+        "penalties": ["Penalty: no blinding"],
+    }
+
+
+def test_process_rater_output_fills_defaults(rater):
+    processed = rater.process_rater_output("{}")
+    assert processed["scores"] == []
+    assert processed["metadata"]["paper_type"] == "Unknown"
+    assert "penalties" not in processed["metadata"]
+
+
+@pytest.mark.parametrize("result_text", ['{"scores": ', "not json", "[1, 2]", None])
+def test_process_rater_output_rejects_malformed_output(rater, result_text):
+    assert rater.process_rater_output(result_text) is None
+
+
+def _status_error(error_class, status_code):
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    response = httpx.Response(status_code, request=request)
+    return error_class("error", response=response, body=None)
+
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/responses")
+
+
+@pytest.mark.parametrize("error", [
+    _status_error(openai.RateLimitError, 429),
+    _status_error(openai.InternalServerError, 500),
+    openai.APIConnectionError(request=REQUEST),
+    openai.APITimeoutError(request=REQUEST),
+])
+def test_transient_errors_are_retried(rater, error):
+    assert rater._is_retryable(error)
+
+
+@pytest.mark.parametrize("error", [
+    _status_error(openai.BadRequestError, 400),
+    _status_error(openai.AuthenticationError, 401),
+    _status_error(openai.NotFoundError, 404),
+    ValueError("bad value"),
+])
+def test_permanent_errors_are_not_retried(rater, error):
+    assert not rater._is_retryable(error)
+
+
+def test_call_with_retries_reraises_permanent_errors_at_once(rater):
+    operation = mock.Mock(side_effect=_status_error(openai.BadRequestError, 400))
+    with pytest.raises(openai.BadRequestError):
+        rater._call_with_retries(operation, "Test", max_retries=3, retry_delay=0)
+    assert operation.call_count == 1
+
+
+def test_call_with_retries_retries_transient_errors(rater):
+    operation = mock.Mock(side_effect=[openai.APIConnectionError(request=REQUEST), "done"])
+    assert rater._call_with_retries(operation, "Test", max_retries=3, retry_delay=0) == "done"
+    assert operation.call_count == 2
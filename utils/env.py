@@ -0,0 +1,18 @@
+import os
+from dotenv import load_dotenv
+
+# Set once the .env file has been loaded; inherited by worker processes,
+# which already receive the loaded variables through their environment
+ENV_LOADED_FLAG = "CLARA_ENV_LOADED"
+
+def load_env() -> None:
+    """
+    Load environment variables from the .env file at most once.
+    
+    Every entry point calls this at import; only the first call reads and
+    parses the file, the rest return immediately.
+    """
+    if os.environ.get(ENV_LOADED_FLAG):
+        return
+    load_dotenv()
+    os.environ[ENV_LOADED_FLAG] = "1"
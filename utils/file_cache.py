@@ -1,124 +1,481 @@
 import os
-import json
+import asyncio
 import hashlib
+import tempfile
+import sqlite3
+import mmap
 import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Any
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Cache keys need no cryptographic strength, only a fast, well-distributed
+# hash: BLAKE3 (SIMD, multi-threaded over large inputs) when installed,
+# otherwise BLAKE2b, which outruns SHA-256 in pure software on 64-bit CPUs
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+# Cache payloads are internal, so they are stored as MessagePack when it is
+# installed: smaller than JSON and decoded without escape processing.
+# Entries written as JSON stay readable either way
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# Per-entry advisory locks that let one worker compute a missing entry while
+# concurrent workers wait for its result (POSIX only)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Extensions of cache files, the one used for new entries first
+CACHE_EXTENSIONS = (".mp", ".json") if MSGPACK_AVAILABLE else (".json",)
+
+# Files larger than this are hashed through an mmap instead of buffered reads
+MMAP_MIN_SIZE = 64 * 1024
+
+# Entry metadata and payloads up to this size live in a single SQLite index
+# in the cache directory; larger payloads get their own file
+INDEX_FILE_NAME = "index.db"
+INLINE_PAYLOAD_MAX_BYTES = 64 * 1024
+
+# Threads unlinking expired payload files in parallel during cleanup;
+# unlink releases the GIL, so the filesystem latencies overlap
+CLEANUP_WORKERS = 32
+
+# Number of deserialized results kept in memory per cache instance
+MEMORY_CACHE_SIZE = 128
+
+# Subdirectory holding the per-entry lock files
+LOCK_DIR_NAME = "locks"
+# How long a worker waits for another one computing the same entry before
+# computing it itself, and how often it retries the lock meanwhile
+LOCK_WAIT_SECONDS = float(os.getenv("CACHE_LOCK_WAIT_SECONDS", "300"))
+LOCK_POLL_INTERVAL = 0.5
+
 class FileCache:
-    """Simple file-based cache for processed documents to avoid reprocessing."""
+    """Simple disk cache for processed documents to avoid reprocessing."""
     
-    def __init__(self, cache_dir: str = "cache", ttl_hours: int = 24):
+    def __init__(self, cache_dir: str = "cache", ttl_hours: int = 24, strict: bool = False):
         """
         Initialize the file cache.
         
         Args:
             cache_dir: Directory to store cache files
             ttl_hours: Time-to-live for cache entries in hours
+            strict: Key entries on a full content hash instead of the file's
+                path, size and modification time
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
+        self.lock_dir = self.cache_dir / LOCK_DIR_NAME
+        self.lock_dir.mkdir(exist_ok=True)
         self.ttl_seconds = ttl_hours * 3600
+        self.strict = strict
+        # In-memory LRU of cache key -> (stored_at, result), so warm repeats
+        # skip reading and parsing the cache file
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._mem_max = MEMORY_CACHE_SIZE
+        self._mem_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = self._open_index()
+        # Strict mode: path -> (size, mtime_ns, content hash), so the
+        # get-then-set sequence on an unchanged file hashes it only once
+        self._key_cache: Dict[str, tuple] = {}
+        
+    @staticmethod
+    def new_hasher():
+        """Create the hash object that ``file_digest`` uses, for hashing a stream as it is written."""
+        if BLAKE3_AVAILABLE:
+            return blake3.blake3(max_threads=blake3.blake3.AUTO)
+        return hashlib.blake2b(digest_size=16)
+    
+    @staticmethod
+    def file_digest(file_path: str) -> str:
+        """
+        Generate a BLAKE3 (or BLAKE2b) hash of file contents.
         
-    def _get_file_hash(self, file_path: str) -> str:
-        """Generate MD5 hash of file contents."""
-        hash_md5 = hashlib.md5()
+        Callers that already have the file's content hash (e.g. computed
+        while writing an upload) can pass it as ``digest`` to ``get`` and
+        ``set`` to key the entry on content instead of on the file's stat.
+        """
+        hasher = FileCache.new_hasher()
         try:
             with open(file_path, "rb") as f:
-                # Read file in chunks to handle large files
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+                size = os.fstat(f.fileno()).st_size
+                if size > MMAP_MIN_SIZE:
+                    # Hash straight from the page cache, skipping the copy
+                    # into Python buffers
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        if hasattr(mmap, "MADV_SEQUENTIAL"):
+                            # Single front-to-back pass: read ahead aggressively
+                            mapped.madvise(mmap.MADV_SEQUENTIAL)
+                        hasher.update(mapped)
+                else:
+                    hasher.update(f.read())
+            return hasher.hexdigest()
         except Exception as e:
-            logger.error(f"Error generating hash for {file_path}: {e}")
+            logger.error("Error generating hash for %s: %s", file_path, e)
             return ""
     
-    def _get_cache_key(self, file_path: str) -> str:
-        """Generate cache key based on file path and hash."""
-        file_hash = self._get_file_hash(file_path)
-        filename = Path(file_path).name
-        return f"{filename}_{file_hash}"
+    @staticmethod
+    async def file_digest_async(file_path: str) -> str:
+        """
+        Async variant of ``file_digest`` for event-loop callers.
+        
+        The hash runs on a worker thread; hashlib and blake3 release the GIL
+        while digesting the mapped file, so concurrent uploads hash in parallel.
+        """
+        return await asyncio.to_thread(FileCache.file_digest, file_path)
     
-    def _get_cache_file_path(self, cache_key: str) -> Path:
-        """Get the full path to cache file."""
-        return self.cache_dir / f"{cache_key}.json"
+    @staticmethod
+    def _fingerprint(file_path: str) -> str:
+        """
+        Fingerprint a file from a single stat: its absolute path, size and
+        modification time. A rewritten file gets a new fingerprint.
+        """
+        st = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}:{st.st_size}:{st.st_mtime_ns}"
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
     
-    def _is_cache_valid(self, cache_file_path: Path) -> bool:
-        """Check if cache file exists and is not expired."""
-        if not cache_file_path.exists():
-            return False
+    def _strict_digest(self, file_path: str) -> str:
+        """Get the content hash of a file, reusing the last one while its stat is unchanged."""
+        st = os.stat(file_path)
+        with self._mem_lock:
+            known = self._key_cache.get(file_path)
+        if known is not None and known[:2] == (st.st_size, st.st_mtime_ns):
+            return known[2]
         
-        file_age = time.time() - cache_file_path.stat().st_mtime
-        return file_age < self.ttl_seconds
+        file_hash = self.file_digest(file_path)
+        with self._mem_lock:
+            self._key_cache[file_path] = (st.st_size, st.st_mtime_ns, file_hash)
+            if len(self._key_cache) > self._mem_max:
+                # Dicts keep insertion order: drop the oldest
+                del self._key_cache[next(iter(self._key_cache))]
+        return file_hash
+    
+    def _get_cache_key(self, file_path: str, digest: Optional[str] = None,
+                       name: Optional[str] = None) -> str:
+        """
+        Generate cache key based on file name and either the given content
+        digest, a full content hash (strict mode) or the stat fingerprint.
+        Callers that already took the base name pass it as ``name``.
+        """
+        if digest:
+            file_hash = digest
+        elif self.strict:
+            file_hash = self._strict_digest(file_path)
+        else:
+            file_hash = self._fingerprint(file_path)
+        filename = name or os.path.basename(file_path)
+        return f"{filename}_{file_hash}"
+    
+    def _get_cache_file_path(self, cache_key: str, extension: str = CACHE_EXTENSIONS[0]) -> Path:
+        """Get the full path to a payload file stored outside the index."""
+        return self.cache_dir / f"{cache_key}{extension}"
+    
+    def _open_index(self) -> sqlite3.Connection:
+        """Open the SQLite index holding entry metadata and inline payloads."""
+        conn = sqlite3.connect(self.cache_dir / INDEX_FILE_NAME, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # payload is NULL when the entry is stored in its own file
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, stored_at REAL NOT NULL, file_name TEXT, '
+            'size INTEGER NOT NULL, format TEXT NOT NULL, payload BLOB)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)')
+        conn.commit()
+        return conn
+    
+    def _iter_cache_files(self):
+        """
+        Iterate over all payload files, in any supported format, as
+        ``os.DirEntry`` objects whose ``stat()`` results are cached.
+        """
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(CACHE_EXTENSIONS) and entry.is_file():
+                    yield entry
+    
+    @staticmethod
+    def _serialize(cache_data: Dict[str, Any]) -> bytes:
+        """Encode a cache entry in the format used for new entries."""
+        if MSGPACK_AVAILABLE:
+            return msgpack.packb(cache_data, use_bin_type=True)
+        # Compact by default; indented only when debugging cache contents
+        option = orjson.OPT_INDENT_2 if logger.isEnabledFor(logging.DEBUG) else 0
+        return orjson.dumps(cache_data, option=option)
+    
+    @staticmethod
+    def _deserialize(payload: bytes, extension: str) -> Dict[str, Any]:
+        """Decode a cache entry stored in the format named by its extension."""
+        if extension == ".mp":
+            return msgpack.unpackb(payload, raw=False)
+        return orjson.loads(payload)
+    
+    def _write_payload_file(self, cache_key: str, payload: bytes) -> Path:
+        """Write a payload file atomically and return its path."""
+        cache_file_path = self._get_cache_file_path(cache_key)
+        # Write to a temporary file in the cache directory and rename it
+        # over the entry, so readers never see a partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{cache_key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, cache_file_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return cache_file_path
+    
+    @staticmethod
+    def _unlink_quietly(path: str):
+        """Remove a file, ignoring files that are already gone."""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    def _unlink_if_expired(path: str, cutoff: float):
+        """
+        Remove a payload file unless it was (re)written after ``cutoff``, so
+        a concurrent ``set`` of the same key keeps its fresh file.
+        """
+        try:
+            if os.stat(path).st_mtime < cutoff:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+    
+    def _unlink_payload_files(self, cache_key: str):
+        """Remove any payload files of an entry."""
+        for extension in CACHE_EXTENSIONS:
+            self._unlink_quietly(self._get_cache_file_path(cache_key, extension))
+    
+    def _mem_get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get an unexpired result from the in-memory LRU."""
+        with self._mem_lock:
+            entry = self._mem.get(cache_key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] >= self.ttl_seconds:
+                del self._mem[cache_key]
+                return None
+            self._mem.move_to_end(cache_key)
+            return entry[1]
     
-    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+    def _mem_put(self, cache_key: str, stored_at: float, result: Dict[str, Any]):
+        """Add a result to the in-memory LRU, evicting the oldest entry when full."""
+        with self._mem_lock:
+            self._mem[cache_key] = (stored_at, result)
+            self._mem.move_to_end(cache_key)
+            if len(self._mem) > self._mem_max:
+                self._mem.popitem(last=False)
+    
+    def get(self, file_path: str, digest: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Get cached result for a file.
         
         Args:
             file_path: Path to the original file
+            digest: Precomputed ``file_digest`` of the file, if available
             
         Returns:
-            Cached result or None if not found/invalid
+            A copy of the cached result or None if not found/invalid
         """
-        cache_key = self._get_cache_key(file_path)
-        cache_file_path = self._get_cache_file_path(cache_key)
+        name = os.path.basename(file_path)
+        cache_key = self._get_cache_key(file_path, digest, name)
         
-        if not self._is_cache_valid(cache_file_path):
-            return None
+        result = self._mem_get(cache_key)
+        if result is not None:
+            logger.info("✅ Memory cache hit for %s", name)
+            return dict(result)
         
         try:
-            with open(cache_file_path, 'r', encoding='utf-8') as f:
-                cached_data = json.load(f)
+            with self._db_lock:
+                row = self._db.execute(
+                    'SELECT stored_at, format, payload FROM entries WHERE key = ?', (cache_key,)
+                ).fetchone()
+            if row is None:
+                return None
+            stored_at, extension, payload = row
+            if time.time() - stored_at >= self.ttl_seconds:
+                return None
+            if payload is None:
+                payload = self._get_cache_file_path(cache_key, extension).read_bytes()
+            cached_data = self._deserialize(payload, extension)
             
-            logger.info(f"✅ Cache hit for {Path(file_path).name}")
-            return cached_data
+            result = cached_data["result"]
+            self._mem_put(cache_key, stored_at, result)
+            logger.info("✅ Cache hit for %s", name)
+            return dict(result)
             
         except Exception as e:
-            logger.error(f"Error reading cache file {cache_file_path}: {e}")
-            # Try to delete corrupted cache file
-            try:
-                cache_file_path.unlink()
-            except:
-                pass
+            logger.error("Error reading cache entry %s: %s", cache_key, e)
             return None
     
-    def set(self, file_path: str, data: Dict[str, Any]) -> bool:
+    def set(self, file_path: str, data: Dict[str, Any], digest: Optional[str] = None) -> bool:
         """
         Cache result for a file.
         
         Args:
             file_path: Path to the original file
             data: Result data to cache
+            digest: Precomputed ``file_digest`` of the file, if available
             
         Returns:
             True if cached successfully, False otherwise
         """
-        cache_key = self._get_cache_key(file_path)
-        cache_file_path = self._get_cache_file_path(cache_key)
+        name = os.path.basename(file_path)
+        cache_key = self._get_cache_key(file_path, digest, name)
         
         try:
             # Add metadata to cached data
             cache_data = {
                 "timestamp": time.time(),
                 "file_path": file_path,
-                "file_name": Path(file_path).name,
+                "file_name": name,
                 "result": data
             }
+            payload = self._serialize(cache_data)
             
-            with open(cache_file_path, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, indent=2, ensure_ascii=False)
+            # Small payloads live inline in the index; larger ones in their
+            # own file, written before the row that points at it
+            inline_payload = payload
+            if len(payload) > INLINE_PAYLOAD_MAX_BYTES:
+                self._write_payload_file(cache_key, payload)
+                inline_payload = None
             
-            logger.info(f"💾 Cached result for {Path(file_path).name}")
+            with self._db_lock, self._db:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO entries (key, stored_at, file_name, size, format, payload) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (cache_key, cache_data["timestamp"], cache_data["file_name"], len(payload),
+                     CACHE_EXTENSIONS[0], inline_payload)
+                )
+            
+            self._mem_put(cache_key, cache_data["timestamp"], dict(data))
+            logger.info("💾 Cached result for %s", name)
             return True
             
         except Exception as e:
-            logger.error(f"Error writing cache file {cache_file_path}: {e}")
+            logger.error("Error writing cache entry %s: %s", cache_key, e)
             return False
     
+    async def get_async(self, file_path: str, digest: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Async variant of ``get``, run on a worker thread."""
+        return await asyncio.to_thread(self.get, file_path, digest)
+    
+    async def set_async(self, file_path: str, data: Dict[str, Any], digest: Optional[str] = None) -> bool:
+        """Async variant of ``set``, run on a worker thread."""
+        return await asyncio.to_thread(self.set, file_path, data, digest)
+    
+    @contextmanager
+    def entry_lock(self, file_path: str, digest: Optional[str] = None):
+        """
+        Hold the advisory lock of a file's cache entry across the lookup, the
+        computation on a miss and the ``set`` (and nothing else), so
+        concurrent threads and worker processes scoring the same paper
+        compute it only once; the later ones find the entry when they get
+        the lock.
+        
+        Args:
+            file_path: Path to the original file
+            digest: Precomputed ``file_digest`` of the file, if available
+            
+        Yields:
+            True if the lock is held, False if it could not be taken within
+            LOCK_WAIT_SECONDS (or locking is unsupported) and the caller
+            proceeds unlocked
+        """
+        if not FCNTL_AVAILABLE:
+            yield False
+            return
+        
+        cache_key = self._get_cache_key(file_path, digest)
+        lock_file = self._acquire_lock_file(self.lock_dir / f"{cache_key}.lock")
+        if lock_file is None:
+            logger.warning("⚠️ Timed out waiting for cache entry %s, proceeding unlocked", cache_key)
+            yield False
+            return
+        # Closing the file releases the lock
+        with lock_file:
+            yield True
+    
+    @staticmethod
+    def _is_current_lock_file(lock_file, path) -> bool:
+        """Whether an open lock file is still the one at ``path``, i.e. was not unlinked by cleanup."""
+        held = os.fstat(lock_file.fileno())
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            return False
+        return (held.st_dev, held.st_ino) == (current.st_dev, current.st_ino)
+    
+    def _acquire_lock_file(self, lock_path: Path):
+        """
+        Open and exclusively lock ``lock_path``, polling for at most
+        LOCK_WAIT_SECONDS.
+        
+        Returns:
+            The open file holding the lock, or None on timeout
+        """
+        # Polled rather than blocking, so a stuck holder delays others by at
+        # most LOCK_WAIT_SECONDS
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while True:
+            # Append mode, so opening never truncates a file in use
+            lock_file = open(lock_path, "ab")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            lock_file.close()
+                            return None
+                        time.sleep(LOCK_POLL_INTERVAL)
+                # A lock on a file cleanup unlinked after we opened it excludes
+                # nobody; retry on the file now at the path
+                if self._is_current_lock_file(lock_file, lock_path):
+                    # Mark the lock as in use for the stale-lock sweep
+                    os.utime(lock_file.fileno())
+                    return lock_file
+            except BaseException:
+                lock_file.close()
+                raise
+            lock_file.close()
+    
+    def _remove_stale_lock(self, path: str):
+        """Remove a lock file no worker currently holds."""
+        try:
+            with open(path, "rb") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Unlinked while held, so a worker that opened the same file
+                # sees it is gone once it gets the lock and retries
+                if self._is_current_lock_file(lock_file, path):
+                    os.unlink(path)
+        except (BlockingIOError, FileNotFoundError):
+            pass
+    
     def invalidate(self, file_path: str) -> bool:
         """
         Invalidate cache for a specific file.
@@ -129,74 +486,110 @@ class FileCache:
         Returns:
             True if invalidated successfully, False otherwise
         """
-        cache_key = self._get_cache_key(file_path)
-        cache_file_path = self._get_cache_file_path(cache_key)
+        name = os.path.basename(file_path)
+        cache_key = self._get_cache_key(file_path, name=name)
+        with self._mem_lock:
+            self._mem.pop(cache_key, None)
+            self._key_cache.pop(file_path, None)
         
         try:
-            if cache_file_path.exists():
-                cache_file_path.unlink()
-                logger.info(f"🗑️ Invalidated cache for {Path(file_path).name}")
-                return True
-            return False
+            with self._db_lock, self._db:
+                invalidated = self._db.execute(
+                    'DELETE FROM entries WHERE key = ?', (cache_key,)
+                ).rowcount > 0
+            self._unlink_payload_files(cache_key)
+            if invalidated:
+                logger.info("🗑️ Invalidated cache for %s", name)
+            return invalidated
         except Exception as e:
-            logger.error(f"Error invalidating cache for {file_path}: {e}")
+            logger.error("Error invalidating cache for %s: %s", file_path, e)
             return False
     
     def cleanup_expired(self) -> int:
         """
-        Clean up expired cache files.
+        Clean up expired cache entries.
         
         Returns:
-            Number of files cleaned up
+            Number of entries cleaned up
         """
         cleaned_count = 0
-        current_time = time.time()
+        cutoff = time.time() - self.ttl_seconds
         
         try:
-            for cache_file in self.cache_dir.glob("*.json"):
-                file_age = current_time - cache_file.stat().st_mtime
-                if file_age > self.ttl_seconds:
-                    cache_file.unlink()
-                    cleaned_count += 1
+            # The stored_at index makes this proportional to the expired rows
+            with self._db_lock, self._db:
+                file_keys = [key for (key,) in self._db.execute(
+                    'SELECT key FROM entries WHERE stored_at < ? AND payload IS NULL', (cutoff,)
+                )]
+                cleaned_count = self._db.execute(
+                    'DELETE FROM entries WHERE stored_at < ?', (cutoff,)
+                ).rowcount
+            expired_paths = {
+                str(self._get_cache_file_path(cache_key, extension))
+                for cache_key in file_keys for extension in CACHE_EXTENSIONS
+            }
+            
+            # Also sweep payload files left without a row, e.g. entries
+            # written before the index existed
+            expired_paths.update(
+                entry.path for entry in self._iter_cache_files() if entry.stat().st_mtime < cutoff
+            )
+            
+            # The files are removed after the index lock is released, so each
+            # one is re-checked: a set that rewrote its key in the meantime
+            # has just written a file newer than the cutoff
+            if expired_paths:
+                with ThreadPoolExecutor(max_workers=min(CLEANUP_WORKERS, len(expired_paths))) as pool:
+                    list(pool.map(self._unlink_if_expired, expired_paths, [cutoff] * len(expired_paths)))
+            
+            # Lock files outlive their entries; drop those not touched
+            # within the TTL
+            if FCNTL_AVAILABLE:
+                with os.scandir(self.lock_dir) as entries:
+                    stale_locks = [entry.path for entry in entries
+                                   if entry.is_file() and entry.stat().st_mtime < cutoff]
+                for path in stale_locks:
+                    self._remove_stale_lock(path)
             
             if cleaned_count > 0:
-                logger.info(f"🧹 Cleaned up {cleaned_count} expired cache files")
+                logger.info("🧹 Cleaned up %d expired cache entries", cleaned_count)
                 
         except Exception as e:
-            logger.error(f"Error during cache cleanup: {e}")
+            logger.error("Error during cache cleanup: %s", e)
         
         return cleaned_count
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
         try:
-            cache_files = list(self.cache_dir.glob("*.json"))
-            total_size = sum(f.stat().st_size for f in cache_files)
-            
-            current_time = time.time()
-            expired_count = sum(
-                1 for f in cache_files 
-                if (current_time - f.stat().st_mtime) > self.ttl_seconds
-            )
+            cutoff = time.time() - self.ttl_seconds
+            with self._db_lock:
+                total_files, total_size, expired_count = self._db.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_at < ?), 0) FROM entries',
+                    (cutoff,)
+                ).fetchone()
             
             return {
                 "cache_dir": str(self.cache_dir),
-                "total_files": len(cache_files),
+                "total_files": total_files,
                 "total_size_bytes": total_size,
                 "total_size_mb": round(total_size / (1024 * 1024), 2),
                 "expired_files": expired_count,
                 "ttl_hours": self.ttl_seconds / 3600
             }
         except Exception as e:
-            logger.error(f"Error getting cache stats: {e}")
+            logger.error("Error getting cache stats: %s", e)
             return {"error": str(e)}
 
 # Global cache instance
 _cache_instance = None
+_cache_lock = threading.Lock()
 
 def get_cache() -> FileCache:
     """Get or create global cache instance."""
     global _cache_instance
     if _cache_instance is None:
-        _cache_instance = FileCache()
+        with _cache_lock:
+            if _cache_instance is None:
+                _cache_instance = FileCache()
     return _cache_instance
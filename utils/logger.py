@@ -1,13 +1,100 @@
 import logging
 import sys
 import os
+import copy
+import queue
+import atexit
 import logging.handlers
-from pythonjsonlogger import jsonlogger
-from datetime import datetime
+import orjson
+from datetime import datetime, timezone
 from typing import Dict, Any, Optional
 
 from config import settings
 
+# Attributes _RecordQueueHandler stores the rendered traceback and stack in
+EXC_TEXT_ATTR = "exc_info_text"
+STACK_TEXT_ATTR = "stack_info_text"
+
+# Attributes every LogRecord carries; anything else was passed via ``extra``
+_RESERVED_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", EXC_TEXT_ATTR, STACK_TEXT_ATTR}
+
+# Renders tracebacks on the logging thread, before records are queued
+_traceback_formatter = logging.Formatter()
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues records unformatted.
+
+    The stdlib ``prepare`` formats the message with a default formatter and
+    folds the traceback into it, so the listener's OrjsonFormatter could no
+    longer emit ``exc_info`` separately. Here the traceback and stack are
+    rendered to text attributes instead, since the traceback's frames must
+    not outlive the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info:
+            setattr(record, EXC_TEXT_ATTR, _traceback_formatter.formatException(record.exc_info))
+            record.exc_info = None
+            record.exc_text = None
+        if record.stack_info:
+            setattr(record, STACK_TEXT_ATTR, _traceback_formatter.formatStack(record.stack_info))
+            record.stack_info = None
+        return record
+
+class OrjsonFormatter(logging.Formatter):
+    """Render each record as a single-line JSON object using orjson."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Format a record as JSON.
+
+        Args:
+            record: Log record to format
+
+        Returns:
+            JSON document for the record, without a trailing newline
+        """
+        log_record: Dict[str, Any] = {
+            "asctime": self.formatTime(record, self.datefmt),
+            "levelname": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_RECORD_ATTRS:
+                log_record[key] = value
+        # Records from _RecordQueueHandler carry the already rendered text
+        if record.exc_info:
+            log_record["exc_info"] = self.formatException(record.exc_info)
+        elif getattr(record, EXC_TEXT_ATTR, None):
+            log_record["exc_info"] = getattr(record, EXC_TEXT_ATTR)
+        if record.stack_info:
+            log_record["stack_info"] = self.formatStack(record.stack_info)
+        elif getattr(record, STACK_TEXT_ATTR, None):
+            log_record["stack_info"] = getattr(record, STACK_TEXT_ATTR)
+        log_record["timestamp"] = datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat()
+        # default=str keeps non-JSON extras (paths, exceptions) loggable
+        return orjson.dumps(log_record, default=str).decode()
+
+# Background listener that formats and writes records off the calling
+# thread. Threads don't survive fork, so a forked process (e.g. a gunicorn
+# worker of a preloaded app) must call setup_logging() again
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+_queue_listener_pid: Optional[int] = None
+
+def _stop_queue_listener() -> None:
+    """Flush queued records and stop the background listener."""
+    global _queue_listener
+    if _queue_listener is not None:
+        # A listener inherited across fork has no thread here to stop
+        if _queue_listener_pid == os.getpid():
+            _queue_listener.stop()
+        _queue_listener = None
+
 def setup_logging() -> logging.Logger:
     """
     Configure JSON logging for the application.
@@ -15,6 +102,8 @@ def setup_logging() -> logging.Logger:
     Returns:
         logging.Logger: Configured logger instance
     """
+    global _queue_listener, _queue_listener_pid
+    
     # Get root logger
     logger = logging.getLogger()
     
@@ -31,13 +120,7 @@ def setup_logging() -> logging.Logger:
         os.makedirs(log_dir, exist_ok=True)
     
     # Create formatter
-    formatter = jsonlogger.JsonFormatter(
-        '%(asctime)s %(levelname)s %(name)s %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
-        json_ensure_ascii=False,
-        json_indent=2 if settings.LOG_LEVEL.upper() == 'DEBUG' else None,
-        timestamp=True
-    )
+    formatter = OrjsonFormatter(datefmt='%Y-%m-%d %H:%M:%S')
     
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
@@ -54,9 +137,16 @@ def setup_logging() -> logging.Logger:
     file_handler.setFormatter(formatter)
     file_handler.setLevel(log_level)
     
-    # Add handlers to the logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # Callers only enqueue records; formatting and console/file writes
+    # (including the midnight rollover) run on the listener thread
+    _stop_queue_listener()
+    log_queue = queue.Queue(-1)
+    _queue_listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _queue_listener.start()
+    _queue_listener_pid = os.getpid()
+    logger.addHandler(_RecordQueueHandler(log_queue))
     
     # Configure uvicorn logging
     for log_name in ["uvicorn", "uvicorn.error", "uvicorn.access"]:
@@ -76,6 +166,7 @@ def setup_logging() -> logging.Logger:
 
 # Create a logger instance
 logger = setup_logging()
+atexit.register(_stop_queue_listener)
 
 def get_logger(name: str) -> logging.Logger:
     """